@@ -0,0 +1,230 @@
+"""
+Caches for hot, repeatable read paths: in-process TTL/LRU and optional Redis
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, TypeVar
+
+import numpy as np
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class TTLCache:
+    """
+    Small LRU cache whose entries also expire after a fixed time-to-live.
+
+    All operations are synchronous, so it is safe to share between coroutines
+    running on the same event loop without a lock.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if it is missing or expired"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expiry, value = item
+        if expiry < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries when full"""
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all entries"""
+        self._data.clear()
+
+    def stats(self) -> dict:
+        """Cache size and hit ratio for monitoring endpoints"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class RedisCache:
+    """
+    Shared byte cache in Redis, used across workers and restarts.
+
+    Redis is an accelerator, not a dependency: connection or command errors
+    are logged and behave like a cache miss. Connects and commands time out
+    after `timeout` seconds, so an unreachable server costs a request at
+    most that long instead of hanging it.
+    """
+
+    def __init__(self, url: str, ttl: int = 600, prefix: str = "", timeout: float = 0.25):
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = aioredis.from_url(
+            url,
+            decode_responses=False,
+            socket_connect_timeout=timeout,
+            socket_timeout=timeout,
+        )
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Return the cached bytes, or None on a miss or Redis error"""
+        try:
+            return await self._client.get(self.prefix + key)
+        except RedisError as e:
+            logger.warning("Redis get failed: %s", e)
+            return None
+
+    async def set(self, key: str, value: bytes) -> None:
+        """Store bytes with the cache TTL, ignoring Redis errors"""
+        try:
+            await self._client.setex(self.prefix + key, self.ttl, value)
+        except RedisError as e:
+            logger.warning("Redis set failed: %s", e)
+
+    async def close(self) -> None:
+        """Close the connection pool"""
+        await self._client.close()
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key: the first caller starts the
+    work, and callers arriving while it is in flight await the same result
+    (or exception) instead of repeating it.
+
+    The work runs in its own task, so it outlives any one caller: cancelling
+    the caller that started it leaves the others waiting on it untouched.
+    fn must therefore not borrow resources scoped to that caller, such as a
+    request's database session.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return fn()'s result, sharing one call among concurrent callers"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        # shield: a caller disconnecting must not cancel the shared call
+        return await asyncio.shield(task)
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark retrieved so a failure nobody is still awaiting isn't reported
+        # as unhandled
+        if not task.cancelled():
+            task.exception()
+
+
+class SemanticCache:
+    """
+    LRU cache keyed by embedding similarity rather than exact keys.
+
+    Vectors must be unit length, so one matrix-vector product gives the
+    cosine similarity against every entry; a brute-force scan over a few
+    thousand rows takes well under a millisecond. Similarity alone can't
+    tell apart texts that differ only in a detail such as a number, so each
+    entry also carries an exact-match scope, and entries expire after ttl
+    seconds.
+    """
+
+    def __init__(self, maxsize: int = 10000, threshold: float = 0.95, ttl: float = 3600.0):
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self._vectors: Optional[np.ndarray] = None  # allocated on first add
+        self._values: List[Any] = []
+        self._scopes: List[Hashable] = []
+        self._expiry = np.zeros(maxsize, dtype=np.float64)
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, vector: np.ndarray, scope: Hashable = None) -> Optional[Any]:
+        """
+        Return the value of the most similar live entry with the same scope,
+        if its similarity reaches the threshold
+        """
+        size = len(self._values)
+        if size:
+            similarities = self._vectors[:size] @ vector
+            live = self._expiry[:size] >= time.monotonic()
+            candidates = np.flatnonzero(live & (similarities >= self.threshold))
+            # Usually zero or one candidate; most similar first
+            for slot in candidates[np.argsort(-similarities[candidates])]:
+                if self._scopes[slot] == scope:
+                    self._clock += 1
+                    self._last_used[slot] = self._clock
+                    self.hits += 1
+                    return self._values[slot]
+        self.misses += 1
+        return None
+
+    def set(self, vector: np.ndarray, value: Any, scope: Hashable = None) -> None:
+        """Add an entry, replacing an expired or else the least recently used one when full"""
+        if self._vectors is None:
+            self._vectors = np.empty((self.maxsize, vector.shape[0]), dtype=np.float32)
+
+        now = time.monotonic()
+        size = len(self._values)
+        if size < self.maxsize:
+            slot = size
+            self._values.append(value)
+            self._scopes.append(scope)
+        else:
+            expired = np.flatnonzero(self._expiry < now)
+            slot = int(expired[0]) if expired.size else int(np.argmin(self._last_used))
+            self._values[slot] = value
+            self._scopes[slot] = scope
+
+        self._vectors[slot] = vector
+        self._expiry[slot] = now + self.ttl
+        self._clock += 1
+        self._last_used[slot] = self._clock
+
+    def stats(self) -> dict:
+        """Cache size and hit ratio for monitoring endpoints"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._values),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
@@ -1,15 +1,20 @@
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import StaticPool
+from sqlalchemy import event, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, declarative_base
+from sqlalchemy.pool import StaticPool, NullPool, QueuePool
+import asyncio
 import os
 import logging
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Awaitable, Callable, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Logging is configured by the application entry point
 logger = logging.getLogger(__name__)
 
 # Database configuration
@@ -19,18 +24,47 @@ if not DATABASE_URL:
     logger.error("DATABASE_URL environment variable is not set")
     raise ValueError("DATABASE_URL environment variable is required")
 
+_db_url = make_url(DATABASE_URL)
+
+# Hosting providers hand out bare postgres:// URLs, which would load a sync
+# driver (or fail outright); the app is async-only, so always use asyncpg
+if _db_url.drivername in ("postgres", "postgresql"):
+    _db_url = _db_url.set(drivername="postgresql+asyncpg")
+
+# Dialect and scrubbed URL are fixed for the process - compute them once
+DIALECT = _db_url.get_backend_name()
+IS_POSTGRES = DIALECT == "postgresql"
+IS_SQLITE = DIALECT == "sqlite"
+_SAFE_URL = _db_url.render_as_string(hide_password=True)
+
+# PgBouncer detection - explicit flag, the compose service name, or its default port
+USE_PGBOUNCER = (
+    os.getenv("DB_USE_PGBOUNCER", "false").lower() == "true"
+    or _db_url.host == "pgbouncer"
+    or _db_url.port == 6432
+)
+
 # Enhanced engine configuration for better performance
 engine_kwargs = {
     "echo": os.getenv("SQL_ECHO", "false").lower() == "true",  # Configurable SQL logging
-    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),  # Connection pool size
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),  # Connection pool size (per worker process)
     "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),  # Max overflow connections
-    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "30")),  # Pool timeout in seconds
-    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "3600")),  # Recycle connections after 1 hour
-    "pool_pre_ping": True,  # Validate connections before use
+    # Fail fast when the pool is exhausted rather than queueing requests for 30s
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT", "5")),  # Pool timeout in seconds
+    # Reuse the most recently returned connection so idle extras age out
+    # and the working set stays warm
+    "pool_use_lifo": os.getenv("DB_POOL_LIFO", "true").lower() == "true",
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),  # Recycle connections after 30 minutes
+    # Pre-ping costs an extra SELECT 1 round-trip per checkout; rely on recycle instead
+    "pool_pre_ping": os.getenv("DB_PRE_PING", "false").lower() == "true",
+    "query_cache_size": int(os.getenv("SQLA_QUERY_CACHE_SIZE", "1200")),  # Compiled SQL LRU size
 }
 
+# QueuePool-only options, dropped when another pool class is used
+_QUEUE_POOL_OPTIONS = ("pool_size", "max_overflow", "pool_timeout", "pool_recycle", "pool_use_lifo")
+
 # Special handling for SQLite (for development/testing)
-if DATABASE_URL.startswith("sqlite"):
+if IS_SQLITE:
     logger.info("Using SQLite database configuration")
     engine_kwargs.update({
         "poolclass": StaticPool,
@@ -40,28 +74,45 @@ if DATABASE_URL.startswith("sqlite"):
         }
     })
     # Remove PostgreSQL-specific options for SQLite
-    engine_kwargs.pop("pool_size", None)
-    engine_kwargs.pop("max_overflow", None)
-    engine_kwargs.pop("pool_timeout", None)
-    engine_kwargs.pop("pool_recycle", None)
+    for option in _QUEUE_POOL_OPTIONS:
+        engine_kwargs.pop(option, None)
 else:
     logger.info("Using PostgreSQL database configuration")
-    # PostgreSQL-specific optimizations
+    # PostgreSQL-specific optimizations. asyncpg sends server_settings as
+    # parameters of the startup message, so they cost no extra round-trips.
+    # scripts/init.sql also sets jit=off on the database for pooled clients.
+    server_settings = {
+        "application_name": "healthcare_cost_navigator",
+        "jit": "off",  # Disable JIT for faster query startup
+    }
     engine_kwargs["connect_args"] = {
-        "server_settings": {
-            "application_name": "healthcare_cost_navigator",
-            "jit": "off",  # Disable JIT for faster query startup
-        },
+        "server_settings": server_settings,
         "command_timeout": 60,
+        # asyncpg driver kwargs: use anonymous prepared statements. Required for
+        # PgBouncer transaction mode (asyncpg commit a3e9cb4) and avoids
+        # "cached plan must not change result type" after schema changes
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
     }
 
+    if USE_PGBOUNCER:
+        logger.info("Using PgBouncer transaction pooling (NullPool)")
+        # PgBouncer owns connection reuse, so every worker hands connections
+        # straight back instead of keeping its own idle pool
+        engine_kwargs["poolclass"] = NullPool
+        for option in _QUEUE_POOL_OPTIONS:
+            engine_kwargs.pop(option, None)
+        # PgBouncer rejects unknown startup parameters; jit=off comes from the
+        # database default set in scripts/init.sql instead
+        server_settings.pop("jit", None)
+
 # Create the async engine
 try:
-    engine = create_async_engine(DATABASE_URL, **engine_kwargs)
-    logger.info(f"Database engine created successfully")
-    logger.info(f"Database URL: {DATABASE_URL.split('@')[0]}@****")  # Hide password in logs
+    engine = create_async_engine(_db_url, **engine_kwargs)
+    logger.info("Database engine created successfully")
+    logger.info("Database URL: %s", _SAFE_URL)  # Password is masked
 except Exception as e:
-    logger.error(f"Failed to create database engine: {e}")
+    logger.error("Failed to create database engine: %s", e)
     raise
 
 # Create async session factory
@@ -69,39 +120,149 @@ AsyncSessionLocal = async_sessionmaker(
     engine,
     class_=AsyncSession,
     expire_on_commit=False,
-    autoflush=True,  # Automatically flush before queries
+    autoflush=False,  # Writes flush explicitly; no flush before every SELECT
     autocommit=False
 )
 
+# Read-only endpoints: same pool, but connections run in AUTOCOMMIT so each
+# SELECT stands alone with no BEGIN/COMMIT round-trips around it
+ro_engine = engine.execution_options(isolation_level="AUTOCOMMIT")
+
+ReadOnlySessionLocal = async_sessionmaker(
+    ro_engine,
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
+class _ReadOnlyTransactionSession(Session):
+    """Session whose every transaction is READ ONLY on PostgreSQL"""
+
+@event.listens_for(_ReadOnlyTransactionSession, "after_begin")
+def _set_transaction_read_only(session, transaction, connection):
+    if IS_POSTGRES:
+        connection.exec_driver_sql("SET TRANSACTION READ ONLY")
+
+# Untrusted SQL (the assistant's generated queries): a real transaction, so
+# READ ONLY applies to every statement, and never committed - writes,
+# data-modifying CTEs and side-effecting functions are refused or rolled back
+ReadOnlyTxSessionLocal = async_sessionmaker(
+    engine,
+    class_=AsyncSession,
+    sync_session_class=_ReadOnlyTransactionSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
 # Create declarative base
 Base = declarative_base()
 
 # Enhanced database dependency with proper error handling and logging
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
-    Enhanced database dependency with connection management and error handling
+    Enhanced database dependency - nothing is committed unless the endpoint
+    commits; closing the session rolls back whatever is left open
     """
-    session = None
     try:
-        session = AsyncSessionLocal()
-        logger.debug("Database session created")
-        yield session
-    except Exception as e:
-        logger.error(f"Database session error: {e}")
-        if session:
-            await session.rollback()
-            logger.debug("Database session rolled back due to error")
+        async with AsyncSessionLocal() as session:
+            yield session
+    except DBAPIError as e:
+        if e.connection_invalidated:
+            # Stale connection (server restart, idle timeout). SQLAlchemy has already
+            # invalidated it and recreated the pool, so the next request reconnects.
+            logger.warning("Database connection was invalidated, pool recreated: %s", e)
+        else:
+            logger.error("Database session error: %s", e)
         raise
-    finally:
-        if session:
-            await session.close()
-            logger.debug("Database session closed")
+
+async def get_ro_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Database dependency for endpoints that only read - no transaction is
+    opened, so nothing needs committing or rolling back
+    """
+    try:
+        async with ReadOnlySessionLocal() as session:
+            yield session
+    except DBAPIError as e:
+        if e.connection_invalidated:
+            logger.warning("Database connection was invalidated, pool recreated: %s", e)
+        else:
+            logger.error("Database session error: %s", e)
+        raise
+
+# Single-flight TTL cache for diagnostic probes hit by monitoring
+class _HealthCache:
+    """
+    Cache a probe result for ttl seconds; concurrent callers share one probe
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.expiry = 0.0
+        self.value: Optional[dict] = None
+        self.lock = asyncio.Lock()
+
+    async def get(self, probe: Callable[[], Awaitable[dict]]) -> dict:
+        if time.monotonic() < self.expiry:
+            return self.value
+        async with self.lock:
+            # Another caller may have refreshed the value while we waited
+            if time.monotonic() < self.expiry:
+                return self.value
+            self.value = await probe()
+            self.expiry = time.monotonic() + self.ttl
+            return self.value
+
+
+_health_cache = _HealthCache(float(os.getenv("HEALTH_TTL_S", "10")))
+_stats_cache = _HealthCache(float(os.getenv("STATS_TTL_S", "60")))
+
+# Server version is static per process - fetched by the first health probe only
+_db_version: Optional[str] = None
+_PING_SQL = text("SELECT 1 AS test, NULL AS v")
+_VERSION_PROBES = {
+    "postgresql": text("SELECT 1 AS test, version() AS v"),
+    "sqlite": text("SELECT 1 AS test, 'SQLite ' || sqlite_version() AS v"),
+}
+
+# Statistics queries, built once and reused on every call
+_TABLE_STATS_SQL = text("""
+    SELECT 
+        schemaname,
+        relname as tablename,
+        n_tup_ins as inserts,
+        n_tup_upd as updates,
+        n_tup_del as deletes,
+        n_live_tup as live_tuples,
+        n_dead_tup as dead_tuples
+    FROM pg_stat_user_tables
+    WHERE schemaname = 'public'
+""")
+_INDEX_STATS_SQL = text("""
+    SELECT 
+        indexrelname as index_name,
+        idx_tup_read,
+        idx_tup_fetch,
+        idx_scan
+    FROM pg_stat_user_indexes
+    WHERE schemaname = 'public'
+    ORDER BY idx_scan DESC
+""")
+_SQLITE_TABLE_LIST = text("SELECT name FROM sqlite_master WHERE type='table'")
+_ANALYZE_SQL = text("ANALYZE")
 
 # Database health check function
 async def check_database_health() -> dict:
     """
-    Check database connectivity and performance
+    Check database connectivity and performance (cached for HEALTH_TTL_S seconds)
+    """
+    return await _health_cache.get(_probe_database_health)
+
+async def _probe_database_health() -> dict:
+    """
+    Run the actual connectivity probe
     """
+    global _db_version
     health_info = {
         "status": "unknown",
         "connection": False,
@@ -111,53 +272,32 @@ async def check_database_health() -> dict:
     }
     
     try:
-        import time
-        from sqlalchemy import text
-        
         start_time = time.time()
         
-        async with AsyncSessionLocal() as session:
-            # Test basic connectivity
-            result = await session.execute(text("SELECT 1 as test"))
-            test_value = result.scalar()
+        async with engine.connect() as conn:
+            # Test basic connectivity (and fetch the version in the same round-trip)
+            probe = _PING_SQL
+            if _db_version is None:
+                probe = _VERSION_PROBES.get(DIALECT, _PING_SQL)
+            row = (await conn.execute(probe)).one()
             
-            if test_value == 1:
+            if row.test == 1:
                 health_info["connection"] = True
                 
-                # Get database version
-                if DATABASE_URL.startswith("postgresql"):
-                    version_result = await session.execute(text("SELECT version()"))
-                    health_info["version"] = version_result.scalar()
-                elif DATABASE_URL.startswith("sqlite"):
-                    version_result = await session.execute(text("SELECT sqlite_version()"))
-                    health_info["version"] = f"SQLite {version_result.scalar()}"
+                # Remember the database version (once per process)
+                if _db_version is None:
+                    _db_version = row.v
+                health_info["version"] = _db_version
                 
                 # Calculate response time
                 end_time = time.time()
                 health_info["response_time_ms"] = round((end_time - start_time) * 1000, 2)
                 
-                # Get pool status for PostgreSQL
-                if hasattr(engine.pool, 'size'):
-                    pool_status = {}
-                    try:
-                        pool_status["size"] = engine.pool.size()
-                        pool_status["checked_in"] = engine.pool.checkedin()
-                        pool_status["checked_out"] = engine.pool.checkedout()
-                        
-                        # Only include invalidated if the method exists
-                        if hasattr(engine.pool, 'invalidated'):
-                            pool_status["invalidated"] = engine.pool.invalidated()
-                        else:
-                            pool_status["invalidated"] = "N/A"
-                            
-                    except AttributeError as e:
-                        logger.warning(f"Some pool methods not available: {e}")
-                        pool_status = {"status": "Pool status unavailable"}
-                    
-                    health_info["pool_status"] = pool_status
+                # Get pool status (only pools that track connections report metrics)
+                health_info["pool_status"] = _read_pool_metrics() or None
                 
                 health_info["status"] = "healthy"
-                logger.info(f"Database health check passed in {health_info['response_time_ms']}ms")
+                logger.debug("Database health check passed in %sms", health_info['response_time_ms'])
             else:
                 health_info["status"] = "unhealthy"
                 logger.warning("Database health check failed: SELECT 1 returned unexpected value")
@@ -165,11 +305,44 @@ async def check_database_health() -> dict:
     except Exception as e:
         health_info["status"] = "error"
         health_info["error"] = str(e)
-        logger.error(f"Database health check failed: {e}")
+        logger.error("Database health check failed: %s", e)
     
     return health_info
 
 # Database initialization and management functions
+# Indexes earlier schema versions created that duplicate another index (an
+# index=True column next to the same named Index) or a leading prefix of a
+# composite one; the longitude bounding-box filter only runs alongside the
+# latitude one, which idx_location_search serves. Dropped on initialization so
+# existing databases stop paying for them on every write.
+_REDUNDANT_INDEXES = (
+    "ix_providers_id", "ix_providers_provider_id", "ix_providers_provider_name",
+    "ix_providers_provider_zip_code", "ix_providers_ms_drg_definition",
+    "ix_providers_average_covered_charges", "ix_providers_latitude",
+    "ix_providers_longitude",
+    "idx_provider_lookup", "idx_drg_text_search", "idx_zip_search",
+    "ix_ratings_id", "ix_ratings_provider_internal_id", "ix_ratings_provider_id",
+    "idx_rating_sort",
+)
+
+def _create_missing_indexes(sync_conn) -> None:
+    """Create model indexes that don't exist yet (honours per-dialect ddl_if)"""
+    if IS_POSTGRES:
+        sync_conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+    if IS_POSTGRES:
+        # The view's after_create hook only fires for a newly created ratings
+        # table; IF NOT EXISTS DDL adds it to databases that already had one
+        for statement in models.PROVIDER_RATINGS_MV_DDL:
+            sync_conn.execute(statement)
+
+async def _drop_redundant_indexes(conn) -> None:
+    """Drop the indexes listed in _REDUNDANT_INDEXES if they exist"""
+    for name in _REDUNDANT_INDEXES:
+        await conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+
 async def initialize_database():
     """
     Initialize database tables and indexes
@@ -178,19 +351,87 @@ async def initialize_database():
         logger.info("Initializing database tables...")
         
         async with engine.begin() as conn:
-            # Import models to ensure they're registered
-            from app.models import Provider, Rating
-            
             # Create all tables
             await conn.run_sync(Base.metadata.create_all)
+            # create_all skips tables that already exist, indexes included;
+            # add any index an existing database is missing
+            await conn.run_sync(_create_missing_indexes)
+            await _drop_redundant_indexes(conn)
             logger.info("Database tables created successfully")
             
         return True
         
     except Exception as e:
-        logger.error(f"Failed to initialize database: {e}")
+        logger.error("Failed to initialize database: %s", e)
         raise
 
+async def initialize_database_parallel():
+    """
+    Initialize tables over concurrent connections, one dependency level at a
+    time, then build indexes (CONCURRENTLY on PostgreSQL). Not atomic - intended
+    for development loads; initialize_database() remains the default.
+    """
+    if not IS_POSTGRES:
+        # SQLite shares a single connection, so there is nothing to overlap
+        return await initialize_database()
+    
+    try:
+        logger.info("Initializing database tables in parallel...")
+        
+        # Needed by the trigram index; CreateTable alone fires no DDL events
+        async with engine.begin() as conn:
+            await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        
+        for level in _table_dependency_levels():
+            await asyncio.gather(*(_create_table(table) for table in level))
+        logger.info("Database tables created successfully")
+        
+        # Indexes on the same table are built one after another, tables in parallel
+        await asyncio.gather(*(_create_table_indexes(table) for table in Base.metadata.sorted_tables))
+        async with engine.begin() as conn:
+            await _drop_redundant_indexes(conn)
+            for statement in models.PROVIDER_RATINGS_MV_DDL:
+                await conn.execute(statement)
+        logger.info("Database indexes created successfully")
+        
+        return True
+        
+    except Exception as e:
+        logger.error("Failed to initialize database: %s", e)
+        raise
+
+def _table_dependency_levels() -> list:
+    """
+    Group tables so each level only references tables from earlier levels
+    """
+    depth = {}
+    for table in Base.metadata.sorted_tables:
+        parents = [fk.referred_table for fk in table.foreign_key_constraints if fk.referred_table is not table]
+        depth[table] = 1 + max((depth[parent] for parent in parents), default=-1)
+    
+    levels = [[] for _ in range(max(depth.values(), default=-1) + 1)]
+    for table, level in depth.items():
+        levels[level].append(table)
+    return levels
+
+async def _create_table(table):
+    """
+    Create a single table (without its indexes) on its own connection
+    """
+    async with engine.begin() as conn:
+        await conn.execute(CreateTable(table, if_not_exists=True))
+
+async def _create_table_indexes(table):
+    """
+    Build a table's indexes outside a transaction with CREATE INDEX CONCURRENTLY
+    """
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for index in table.indexes:
+            statement = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+            statement = statement.replace(" INDEX ", " INDEX CONCURRENTLY ", 1)
+            await conn.execute(text(statement))
+
 async def drop_all_tables():
     """
     Drop all database tables (use with caution!)
@@ -199,19 +440,24 @@ async def drop_all_tables():
         logger.warning("Dropping all database tables...")
         
         async with engine.begin() as conn:
-            from app.models import Provider, Rating
             await conn.run_sync(Base.metadata.drop_all)
             logger.info("All database tables dropped")
             
         return True
         
     except Exception as e:
-        logger.error(f"Failed to drop tables: {e}")
+        logger.error("Failed to drop tables: %s", e)
         raise
 
 async def get_database_stats() -> dict:
     """
-    Get comprehensive database statistics
+    Get comprehensive database statistics (cached for STATS_TTL_S seconds)
+    """
+    return await _stats_cache.get(_collect_database_stats)
+
+async def _collect_database_stats() -> dict:
+    """
+    Query table and index statistics
     """
     stats = {
         "tables": {},
@@ -220,26 +466,11 @@ async def get_database_stats() -> dict:
     }
     
     try:
-        async with AsyncSessionLocal() as session:
-            from sqlalchemy import text
-            
+        async with engine.connect() as conn:
             # Get table statistics
-            if DATABASE_URL.startswith("postgresql"):
+            if IS_POSTGRES:
                 # PostgreSQL-specific queries
-                table_stats_query = text("""
-                    SELECT 
-                        schemaname,
-                        relname as tablename,
-                        n_tup_ins as inserts,
-                        n_tup_upd as updates,
-                        n_tup_del as deletes,
-                        n_live_tup as live_tuples,
-                        n_dead_tup as dead_tuples
-                    FROM pg_stat_user_tables
-                    WHERE schemaname = 'public'
-                """)
-                
-                result = await session.execute(table_stats_query)
+                result = await conn.execute(_TABLE_STATS_SQL)
                 for row in result:
                     stats["tables"][row.tablename] = {
                         "inserts": row.inserts,
@@ -250,18 +481,7 @@ async def get_database_stats() -> dict:
                     }
                 
                 # Get index usage statistics
-                index_stats_query = text("""
-                    SELECT 
-                        indexrelname as index_name,
-                        idx_tup_read,
-                        idx_tup_fetch,
-                        idx_scan
-                    FROM pg_stat_user_indexes
-                    WHERE schemaname = 'public'
-                    ORDER BY idx_scan DESC
-                """)
-                
-                result = await session.execute(index_stats_query)
+                result = await conn.execute(_INDEX_STATS_SQL)
                 for row in result:
                     stats["indexes"][row.index_name] = {
                         "tuples_read": row.idx_tup_read,
@@ -269,27 +489,57 @@ async def get_database_stats() -> dict:
                         "scans": row.idx_scan
                     }
                 
-            elif DATABASE_URL.startswith("sqlite"):
+            elif IS_SQLITE:
                 # SQLite-specific queries
-                table_list_query = text("SELECT name FROM sqlite_master WHERE type='table'")
-                result = await session.execute(table_list_query)
+                result = await conn.execute(_SQLITE_TABLE_LIST)
                 
-                for row in result:
-                    table_name = row.name
-                    if table_name not in ['sqlite_sequence']:
-                        count_query = text(f"SELECT COUNT(*) as count FROM {table_name}")
-                        count_result = await session.execute(count_query)
-                        stats["tables"][table_name] = {
-                            "row_count": count_result.scalar()
+                # Only count known model tables (identifier whitelist), all in one query
+                table_names = [row.name for row in result if row.name in Base.metadata.tables]
+                if table_names:
+                    quote = engine.dialect.identifier_preparer.quote
+                    count_query = text(" UNION ALL ".join(
+                        f"SELECT '{name}' AS tbl, COUNT(*) AS c FROM {quote(name)}"
+                        for name in table_names
+                    ))
+                    result = await conn.execute(count_query)
+                    for row in result:
+                        stats["tables"][row.tbl] = {
+                            "row_count": row.c
                         }
             
     except Exception as e:
-        logger.error(f"Error getting database stats: {e}")
+        logger.error("Error getting database stats: %s", e)
         stats["error"] = str(e)
     
     return stats
 
-# Connection pool monitoring
+# Connection pool monitoring - pool methods are resolved once per pool object
+# instead of probing with hasattr() on every call
+_POOL_METRIC_METHODS = {
+    "size": "size",
+    "checked_in": "checkedin",
+    "checked_out": "checkedout",
+    "overflow": "overflow",
+}
+_POOL_METRICS: dict = {}
+_pool_metrics_owner = None
+
+def _read_pool_metrics() -> dict:
+    """
+    Read the metrics the current pool supports (empty for NullPool/StaticPool)
+    """
+    global _POOL_METRICS, _pool_metrics_owner
+    pool = engine.pool
+    if pool is not _pool_metrics_owner:
+        # engine.dispose() swaps in a fresh pool, so rebind when it changes
+        _POOL_METRICS = {
+            key: getattr(pool, method)
+            for key, method in _POOL_METRIC_METHODS.items()
+            if hasattr(pool, method)
+        }
+        _pool_metrics_owner = pool
+    return {key: read() for key, read in _POOL_METRICS.items()}
+
 async def get_pool_status() -> dict:
     """
     Get connection pool status and metrics
@@ -300,39 +550,25 @@ async def get_pool_status() -> dict:
     }
     
     try:
-        if hasattr(engine, 'pool'):
-            pool = engine.pool
-            pool_info.update({
-                "available": True,
-                "pool_type": type(pool).__name__,
-            })
-            
-            # Get pool metrics if available
-            if hasattr(pool, 'size'):
-                try:
-                    pool_info.update({
-                        "size": pool.size(),
-                        "checked_in": pool.checkedin(),
-                        "checked_out": pool.checkedout(),
-                        "overflow": pool.overflow(),
-                    })
-                    
-                    # Only include invalidated if the method exists
-                    if hasattr(pool, 'invalidated'):
-                        pool_info["invalidated"] = pool.invalidated()
-                    
-                    # Calculate utilization
-                    total_connections = pool.size() + pool.overflow()
-                    if total_connections > 0:
-                        pool_info["utilization_percent"] = round(
-                            (pool.checkedout() / total_connections) * 100, 2
-                        )
-                except AttributeError as e:
-                    logger.warning(f"Some pool methods not available: {e}")
-                    pool_info["pool_methods_limited"] = True
+        pool_info.update({
+            "available": True,
+            "pool_type": type(engine.pool).__name__,
+        })
+        
+        # Get pool metrics if available
+        metrics = _read_pool_metrics()
+        pool_info.update(metrics)
+        
+        # Calculate utilization
+        if "size" in metrics and "overflow" in metrics:
+            total_connections = metrics["size"] + metrics["overflow"]
+            if total_connections > 0:
+                pool_info["utilization_percent"] = round(
+                    (metrics["checked_out"] / total_connections) * 100, 2
+                )
     
     except Exception as e:
-        logger.error(f"Error getting pool status: {e}")
+        logger.error("Error getting pool status: %s", e)
         pool_info["error"] = str(e)
     
     return pool_info
@@ -342,48 +578,116 @@ async def analyze_tables():
     """
     Analyze tables for better query performance (PostgreSQL only)
     """
-    if not DATABASE_URL.startswith("postgresql"):
+    if not IS_POSTGRES:
         logger.info("Table analysis skipped - not using PostgreSQL")
         return False
     
     try:
-        async with AsyncSessionLocal() as session:
-            from sqlalchemy import text
+        # ANALYZE needs no transaction - run it on an autocommit connection
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
             
             logger.info("Analyzing database tables for performance optimization...")
             
             # Analyze all tables
-            await session.execute(text("ANALYZE"))
-            await session.commit()
+            await conn.execute(_ANALYZE_SQL)
             
             logger.info("Database table analysis completed")
             return True
             
     except Exception as e:
-        logger.error(f"Error analyzing tables: {e}")
+        logger.error("Error analyzing tables: %s", e)
         return False
 
-async def vacuum_database():
+async def vacuum_database(table: Optional[str] = None, verbose: bool = False):
     """
     Vacuum database to reclaim space and update statistics (PostgreSQL only)
     """
-    if not DATABASE_URL.startswith("postgresql"):
+    if not IS_POSTGRES:
         logger.info("Database vacuum skipped - not using PostgreSQL")
         return False
     
+    if table is not None and table not in Base.metadata.tables:
+        logger.error("Database vacuum skipped - unknown table: %s", table)
+        return False
+    
     try:
-        # Note: VACUUM cannot be run inside a transaction
         logger.info("Starting database vacuum operation...")
         
-        # This would need to be run outside of a transaction
-        # For now, we'll just return a message
-        logger.info("Database vacuum should be run manually: VACUUM ANALYZE;")
+        options = "ANALYZE, VERBOSE" if verbose else "ANALYZE"
+        statement = f"VACUUM ({options})"
+        if table is not None:
+            statement += " " + engine.dialect.identifier_preparer.quote(table)
+        
+        # VACUUM cannot be run inside a transaction - use an autocommit connection
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text(statement))
+        
+        logger.info("Database vacuum completed: %s", statement)
+        return True
+        
+    except Exception as e:
+        logger.error("Error during database vacuum: %s", e)
+        return False
+
+# Advisory lock key serializing provider_ratings_mv refreshes across app
+# workers and etl.py. Transaction-scoped, so it is safe behind PgBouncer in
+# transaction mode.
+_RATING_VIEW_LOCK_ID = 0x7261746E  # "ratn"
+
+async def refresh_rating_view(skip_if_busy: bool = False) -> bool:
+    """
+    Recompute provider_ratings_mv after ratings change (PostgreSQL only).
+    CONCURRENTLY keeps the view readable by searches while it refreshes.
+    With skip_if_busy, return False at once if another refresh is running
+    instead of queueing a second full re-aggregation behind it.
+    """
+    if not IS_POSTGRES:
+        return False
+    
+    try:
+        async with engine.begin() as conn:
+            if skip_if_busy:
+                locked = await conn.scalar(
+                    text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _RATING_VIEW_LOCK_ID}
+                )
+                if not locked:
+                    logger.debug("provider_ratings_mv refresh already running, skipped")
+                    return False
+            else:
+                await conn.execute(
+                    text("SELECT pg_advisory_xact_lock(:key)"), {"key": _RATING_VIEW_LOCK_ID}
+                )
+            await conn.execute(text("REFRESH MATERIALIZED VIEW CONCURRENTLY provider_ratings_mv"))
+        logger.info("Refreshed provider_ratings_mv")
         return True
         
     except Exception as e:
-        logger.error(f"Error during database vacuum: {e}")
+        logger.error("Error refreshing provider_ratings_mv: %s", e)
         return False
 
+# Connection pool warm-up
+async def warm_pool() -> int:
+    """
+    Open the pool's base connections up front so the first burst of requests
+    doesn't pay TCP/auth setup. Returns the number of connections opened.
+    """
+    if not isinstance(engine.pool, QueuePool):
+        # NullPool (PgBouncer) keeps nothing open; StaticPool has one connection
+        return 0
+    
+    size = engine.pool.size()
+    try:
+        conns = await asyncio.gather(*[engine.connect() for _ in range(size)])
+        # Returning them checks them back in; the pool keeps them open
+        await asyncio.gather(*[conn.close() for conn in conns])
+        logger.info("Warmed database pool with %d connections", size)
+        return size
+    except Exception as e:
+        logger.warning("Database pool warm-up failed: %s", e)
+        return 0
+
 # Graceful shutdown
 async def close_database():
     """
@@ -394,7 +698,7 @@ async def close_database():
         await engine.dispose()
         logger.info("Database connections closed successfully")
     except Exception as e:
-        logger.error(f"Error closing database connections: {e}")
+        logger.error("Error closing database connections: %s", e)
 
 # Database configuration summary
 def get_database_config() -> dict:
@@ -402,14 +706,16 @@ def get_database_config() -> dict:
     Get current database configuration for debugging
     """
     config = {
-        "database_url": DATABASE_URL.split('@')[0] + "@****" if '@' in DATABASE_URL else DATABASE_URL,
+        "database_url": _SAFE_URL,
         "engine_config": {
             "echo": engine.echo,
-            "pool_size": getattr(engine.pool, 'size', lambda: 'N/A')() if hasattr(engine, 'pool') else 'N/A',
-            "max_overflow": getattr(engine.pool, '_max_overflow', 'N/A') if hasattr(engine, 'pool') else 'N/A',
-            "pool_timeout": getattr(engine.pool, '_timeout', 'N/A') if hasattr(engine, 'pool') else 'N/A',
+            "pool_size": _read_pool_metrics().get("size", "N/A"),
+            "max_overflow": getattr(engine.pool, '_max_overflow', 'N/A'),
+            "pool_timeout": getattr(engine.pool, '_timeout', 'N/A'),
+            "query_cache_size": engine_kwargs["query_cache_size"],
         },
-        "database_type": "PostgreSQL" if DATABASE_URL.startswith("postgresql") else "SQLite" if DATABASE_URL.startswith("sqlite") else "Unknown"
+        "database_type": "PostgreSQL" if IS_POSTGRES else "SQLite" if IS_SQLITE else "Unknown",
+        "pgbouncer": USE_PGBOUNCER,
     }
     
     return config
@@ -417,16 +723,30 @@ def get_database_config() -> dict:
 # Export main components
 __all__ = [
     "engine",
+    "DIALECT",
+    "IS_POSTGRES",
+    "USE_PGBOUNCER",
     "AsyncSessionLocal", 
+    "ro_engine",
+    "ReadOnlySessionLocal",
+    "ReadOnlyTxSessionLocal",
     "Base",
     "get_db",
+    "get_ro_db",
     "check_database_health",
     "initialize_database",
+    "initialize_database_parallel",
     "drop_all_tables",
     "get_database_stats",
     "get_pool_status",
     "analyze_tables",
     "vacuum_database",
+    "refresh_rating_view",
+    "warm_pool",
     "close_database",
     "get_database_config"
-]
\ No newline at end of file
+]
+
+# Register the models on Base.metadata once, at import time (after Base exists,
+# so the circular import back into this module resolves)
+from app import models  # noqa: E402,F401
@@ -1,632 +1,626 @@
-from fastapi import FastAPI, HTTPException, Depends, Query
-from fastapi.responses import HTMLResponse, PlainTextResponse
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.openapi.docs import get_redoc_html, get_swagger_ui_html
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, ORJSONResponse, PlainTextResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from typing import List
+from sqlalchemy import select, func, text
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, List
+import asyncio
+import gzip
+import hashlib
+import httpx
 import logging
+import orjson
 import os
+import time
 from dotenv import load_dotenv
 
-from app.database import get_db
-from app.models import Provider
-from app.schemas import ProviderResponse, AskRequest, AskResponse
+try:
+    import brotli
+except ImportError:  # brotli is optional; the root page falls back to gzip
+    brotli = None
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:  # h2 is optional; LLM calls fall back to HTTP/1.1 keep-alive
+    HTTP2_AVAILABLE = False
+
+from app.cache import RedisCache, SemanticCache, SingleFlight, TTLCache
+from app.database import IS_POSTGRES, get_ro_db, refresh_rating_view, ro_engine, ReadOnlySessionLocal, ReadOnlyTxSessionLocal, warm_pool
+from app.models import Provider, Rating
+from app.schemas import ProviderResponse, AskRequest, AskResponse, ZIP_CODE_PATTERN
 from app.services.provider_service import ProviderService
 from app.services.ai_service import AIService
 
 load_dotenv()
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
+# Set up logging; production deployments typically run WARNING, which also
+# silences uvicorn's per-request access log
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+logging.basicConfig(level=LOG_LEVEL)
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Open shared resources before the first request and release them on
+    shutdown: database pool, /stats refresh task, Redis and LLM connections
+    """
+    global _stats_task, _rating_view_task
+    # Open the database pool's connections before traffic arrives
+    await warm_pool()
+    _stats_task = asyncio.create_task(_refresh_stats_forever())
+    if IS_POSTGRES and RATING_VIEW_REFRESH_S > 0:
+        _rating_view_task = asyncio.create_task(_refresh_rating_view_forever())
+    
+    yield
+    
+    _stats_task.cancel()
+    if _rating_view_task is not None:
+        _rating_view_task.cancel()
+    if redis_cache is not None:
+        await redis_cache.close()
+    await ai_service.aclose()
+
 app = FastAPI(
     title="Healthcare Cost Navigator",
     description="Search for hospitals by MS-DRG procedures and get AI-powered assistance with enhanced ranking",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
+    # Served from a schema prebuilt at import instead; see the end of the module
+    openapi_url=None,
+)
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that leaves the given paths uncompressed. Starlette's gzip
+    responder buffers a streamed body until it ends, which would hold back
+    every chunk of the streaming endpoints until the last one.
+    """
+
+    def __init__(self, app, exclude_paths=frozenset(), **kwargs):
+        super().__init__(app, **kwargs)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Compress JSON list responses; responses that already set Content-Encoding
+# (the pre-compressed root page) pass through untouched, and streamed ones
+# are sent as produced
+app.add_middleware(
+    StreamingAwareGZipMiddleware,
+    minimum_size=512,
+    exclude_paths={"/providers/stream", "/ask-stream"},
+)
+
+# One pooled client for every LLM call, so /ask reuses warm TLS connections
+# (multiplexed over HTTP/2 when h2 is installed) instead of handshaking anew
+llm_http_client = httpx.AsyncClient(
+    http2=HTTP2_AVAILABLE,
+    limits=httpx.Limits(max_keepalive_connections=50, max_connections=200),
 )
 
 # Initialize services
 try:
     provider_service = ProviderService()
-    ai_service = AIService()
+    ai_service = AIService(http_client=llm_http_client)
     logger.info("Services initialized successfully")
 except Exception as e:
-    logger.error(f"Failed to initialize services: {e}")
+    logger.error("Failed to initialize services: %s", e)
     raise
 
+# Short-lived cache of ranked search results, keyed by the normalized query
+provider_search_cache = TTLCache(
+    maxsize=int(os.getenv("SEARCH_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("SEARCH_CACHE_TTL_S", "30")),
+)
+
+# Row counts reported by /health; failures are not cached
+health_counts_cache = TTLCache(maxsize=1, ttl=float(os.getenv("HEALTH_CACHE_TTL_S", "30")))
+
+# Optional Redis cache shared by all workers (docker-compose --profile cache)
+REDIS_URL = os.getenv("REDIS_URL")
+redis_cache = (
+    RedisCache(
+        REDIS_URL,
+        ttl=int(os.getenv("REDIS_CACHE_TTL_S", "600")),
+        prefix="prov:",
+        timeout=float(os.getenv("REDIS_TIMEOUT_S", "0.25")),
+    )
+    if REDIS_URL else None
+)
+
+def _search_key(drg: str, zip_code: str, radius_km: int, limit: int) -> str:
+    """Normalize search parameters so equivalent queries share cache entries"""
+    return f"{drg.lower()}:{zip_code}:{radius_km}:{limit}"
+
+async def _query_rows(key: str, drg: str, zip_code: str, radius_km: int, limit: int) -> List[dict]:
+    """
+    Run a provider search on its own pooled connection and cache the rows.
+    A bare Core connection: no Session or unit of work around a pure read.
+    """
+    async with ro_engine.connect() as conn:
+        results = await provider_service.search_providers(conn, drg, zip_code, radius_km, limit)
+    rows = ProviderResponse.dump_many(results)
+    provider_search_cache.set(key, rows)
+    return rows
+
+async def _search_payload(drg: str, zip_code: str, radius_km: int, limit: int) -> bytes:
+    """JSON body for /providers: in-process cache, then Redis, then the database"""
+    key = _search_key(drg, zip_code, radius_km, limit)
+    rows = provider_search_cache.get(key)
+    if rows is not None:
+        return orjson.dumps(rows)
+    
+    if redis_cache is not None:
+        payload = await redis_cache.get(key)
+        if payload is not None:
+            return payload
+    
+    payload = orjson.dumps(await _query_rows(key, drg, zip_code, radius_km, limit))
+    if redis_cache is not None:
+        await redis_cache.set(key, payload)
+    return payload
+
+# Enhanced HTML interface, read once at import instead of on every request.
+# The same directory is mounted at /static for a fronting proxy to serve directly
+STATIC_DIR = Path(__file__).parent / "static"
+app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+_ROOT_HTML_BYTES = (STATIC_DIR / "index.html").read_bytes()
+_ROOT_ETAG = '"' + hashlib.md5(_ROOT_HTML_BYTES).hexdigest() + '"'
+_ROOT_HEADERS = {
+    "ETag": _ROOT_ETAG,
+    "Cache-Control": "public, max-age=3600",
+    "Vary": "Accept-Encoding",
+}
+_ROOT_RESPONSE = Response(content=_ROOT_HTML_BYTES, media_type="text/html", headers=_ROOT_HEADERS)
+_ROOT_NOT_MODIFIED = Response(status_code=304, headers=_ROOT_HEADERS)
+
+# Compressed once at maximum quality, since the page never changes at runtime
+_ROOT_GZ_RESPONSE = Response(
+    content=gzip.compress(_ROOT_HTML_BYTES, 9),
+    media_type="text/html",
+    headers={**_ROOT_HEADERS, "Content-Encoding": "gzip"},
+)
+_ROOT_BR_RESPONSE = Response(
+    content=brotli.compress(_ROOT_HTML_BYTES, quality=11),
+    media_type="text/html",
+    headers={**_ROOT_HEADERS, "Content-Encoding": "br"},
+) if brotli is not None else None
+
 @app.get("/", response_class=HTMLResponse)
-async def root():
+async def root(request: Request):
     """Enhanced HTML interface with better styling and value-based ranking display"""
-    html_content = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>Healthcare Cost Navigator</title>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <style>
-            body { 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-                max-width: 1200px; 
-                margin: 0 auto; 
-                padding: 20px; 
-                background-color: #f8f9fa;
-                line-height: 1.6;
-            }
-            .header {
-                background: linear-gradient(135deg, #007bff 0%, #0056b3 100%);
-                color: white;
-                padding: 30px;
-                border-radius: 10px;
-                margin-bottom: 30px;
-                text-align: center;
-            }
-            .container {
-                background: white;
-                padding: 30px;
-                border-radius: 10px;
-                box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-                margin-bottom: 20px;
-            }
-            .form-group { 
-                margin-bottom: 20px; 
-            }
-            label { 
-                display: block; 
-                margin-bottom: 8px; 
-                font-weight: 600; 
-                color: #333;
-            }
-            input, textarea, select { 
-                width: 100%; 
-                padding: 12px; 
-                border: 2px solid #e9ecef; 
-                border-radius: 6px; 
-                font-size: 14px;
-                transition: border-color 0.3s;
-            }
-            input:focus, textarea:focus { 
-                border-color: #007bff; 
-                outline: none; 
-                box-shadow: 0 0 0 3px rgba(0,123,255,0.1);
-            }
-            button { 
-                background: linear-gradient(135deg, #28a745 0%, #20c997 100%);
-                color: white; 
-                padding: 12px 24px; 
-                border: none; 
-                border-radius: 6px; 
-                cursor: pointer; 
-                font-size: 16px;
-                font-weight: 600;
-                transition: transform 0.2s;
-            }
-            button:hover { 
-                transform: translateY(-2px);
-                box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-            }
-            .results { 
-                margin-top: 20px; 
-                padding: 20px; 
-                background: linear-gradient(135deg, #f8f9fa 0%, #e9ecef 100%); 
-                border-radius: 8px; 
-                border-left: 4px solid #007bff;
-            }
-            .provider-card { 
-                margin-bottom: 20px; 
-                padding: 20px; 
-                background: white;
-                border-radius: 8px; 
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-                border-left: 4px solid #007bff;
-                transition: transform 0.2s;
-            }
-            .provider-card:hover {
-                transform: translateY(-2px);
-                box-shadow: 0 4px 15px rgba(0,0,0,0.15);
-            }
-            .provider-header {
-                display: flex;
-                justify-content: space-between;
-                align-items: center;
-                margin-bottom: 12px;
-            }
-            .provider-name {
-                font-size: 18px;
-                font-weight: 700;
-                color: #007bff;
-                margin: 0;
-            }
-            .rating-badge {
-                background: linear-gradient(135deg, #28a745 0%, #20c997 100%);
-                color: white;
-                padding: 6px 12px;
-                border-radius: 20px;
-                font-size: 13px;
-                font-weight: 600;
-            }
-            .provider-details {
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-                gap: 15px;
-                margin-top: 15px;
-            }
-            .detail-item {
-                display: flex;
-                align-items: center;
-                gap: 8px;
-                font-size: 14px;
-            }
-            .icon {
-                font-size: 16px;
-                width: 20px;
-            }
-            .cost-highlight {
-                color: #dc3545;
-                font-weight: 700;
-                font-size: 16px;
-            }
-            .answer { 
-                margin-top: 20px; 
-                padding: 20px; 
-                background: linear-gradient(135deg, #e8f5e8 0%, #d4edda 100%); 
-                border-radius: 8px; 
-                font-size: 16px; 
-                line-height: 1.6;
-                border-left: 4px solid #28a745;
-            }
-            .error { 
-                color: #dc3545; 
-                background: linear-gradient(135deg, #f8d7da 0%, #f5c6cb 100%); 
-                padding: 15px; 
-                border-radius: 6px; 
-                border-left: 4px solid #dc3545;
-            }
-            .examples { 
-                margin-top: 25px; 
-                padding: 20px;
-                background: #fff3cd;
-                border-radius: 8px;
-                border-left: 4px solid #ffc107;
-            }
-            .examples h4 {
-                margin-top: 0;
-                color: #856404;
-            }
-            .example-item {
-                margin: 8px 0;
-                color: #666;
-                cursor: pointer;
-                padding: 5px;
-                border-radius: 4px;
-                transition: background-color 0.2s;
-            }
-            .example-item:hover {
-                background-color: #fff8e1;
-            }
-            .value-score {
-                background: linear-gradient(135deg, #6f42c1 0%, #e83e8c 100%);
-                color: white;
-                padding: 4px 8px;
-                border-radius: 12px;
-                font-size: 12px;
-                font-weight: 600;
-            }
-            .loading {
-                display: none;
-                text-align: center;
-                padding: 20px;
-                color: #666;
-            }
-            .spinner {
-                border: 3px solid #f3f3f3;
-                border-top: 3px solid #007bff;
-                border-radius: 50%;
-                width: 30px;
-                height: 30px;
-                animation: spin 1s linear infinite;
-                margin: 0 auto 10px;
-            }
-            @keyframes spin {
-                0% { transform: rotate(0deg); }
-                100% { transform: rotate(360deg); }
-            }
-        </style>
-    </head>
-    <body>
-        <div class="header">
-            <h1>🏥 Healthcare Cost Navigator</h1>
-            <p>Find the best value hospitals with smart ranking that balances cost, quality, and experience</p>
-        </div>
-        
-        <div class="container">
-            <h2>🔍 Search Providers</h2>
-            <form id="searchForm">
-                <div class="form-group">
-                    <label>DRG Code or Description:</label>
-                    <input type="text" id="drg" name="drg" placeholder="470 or 'knee replacement'" required>
-                </div>
-                <div class="form-group">
-                    <label>ZIP Code:</label>
-                    <input type="text" id="zip" name="zip" placeholder="10001" required>
-                </div>
-                <div class="form-group">
-                    <label>Search Radius (km):</label>
-                    <input type="number" id="radius" name="radius" value="50" min="1" max="500">
-                </div>
-                <div class="form-group">
-                    <label>Max Results:</label>
-                    <input type="number" id="limit" name="limit" value="20" min="1" max="100">
-                </div>
-                <button type="submit">Search Hospitals</button>
-            </form>
-        </div>
-        
-        <div class="container">
-            <h2>🤖 AI Assistant</h2>
-            <form id="askForm">
-                <div class="form-group">
-                    <label>Ask a question about healthcare costs and quality:</label>
-                    <textarea id="question" name="question" rows="3" 
-                             placeholder="Who has the best value for knee replacement near 10001?"></textarea>
-                </div>
-                <button type="submit">Ask AI Assistant</button>
-            </form>
-        </div>
-        
-        <div class="examples">
-            <h4>💡 Example Questions (click to try):</h4>
-            <div class="example-item" onclick="fillQuestion('Who is the cheapest for DRG 470 within 25 miles of 10001?')">
-                • "Who is the cheapest for DRG 470 within 25 miles of 10001?"
-            </div>
-            <div class="example-item" onclick="fillQuestion('What are the best rated hospitals for heart surgery in New York?')">
-                • "What are the best rated hospitals for heart surgery in New York?"
-            </div>
-            <div class="example-item" onclick="fillQuestion('Show me the best value hospitals for knee replacement near Manhattan')">
-                • "Show me the best value hospitals for knee replacement near Manhattan"
-            </div>
-            <div class="example-item" onclick="fillQuestion('Find cost-effective options for cardiac procedures with good ratings')">
-                • "Find cost-effective options for cardiac procedures with good ratings"
-            </div>
-            <div class="example-item" onclick="fillQuestion('Which hospital offers the best combination of quality and affordability?')">
-                • "Which hospital offers the best combination of quality and affordability?"
-            </div>
-        </div>
-        
-        <div class="loading" id="loading">
-            <div class="spinner"></div>
-            <p>Searching hospitals...</p>
-        </div>
-        
-        <div id="results"></div>
-        
-        <script>
-            function showLoading() {
-                document.getElementById('loading').style.display = 'block';
-                document.getElementById('results').innerHTML = '';
-            }
-            
-            function hideLoading() {
-                document.getElementById('loading').style.display = 'none';
-            }
-            
-            function fillQuestion(question) {
-                document.getElementById('question').value = question;
-            }
-            
-            function showError(message) {
-                hideLoading();
-                document.getElementById('results').innerHTML = 
-                    '<div class="error">❌ Error: ' + message + '</div>';
-            }
-            
-            function calculateValueScore(provider) {
-                try {
-                    // Same composite scoring as backend
-                    const cost = Math.max(provider.average_covered_charges || 50000, 1000);
-                    const costScore = 1000000 / cost;
-                    const ratingScore = (provider.average_rating || 5.0) * 15;
-                    const distanceScore = Math.max(0, 100 - (provider.distance_km || 50) * 1.5);
-                    const volumeScore = Math.min(Math.log((provider.total_discharges || 0) + 1) * 10, 50);
-                    
-                    return Math.round(costScore * 0.4 + ratingScore * 0.35 + distanceScore * 0.15 + volumeScore * 0.1);
-                } catch {
-                    return 0;
-                }
-            }
-            
-            function showResults(data) {
-                hideLoading();
-                if (Array.isArray(data) && data.length > 0) {
-                    let html = '<div class="results"><h3>🏆 Found ' + data.length + ' hospitals (ranked by value score):</h3>';
-                    
-                    data.slice(0, 10).forEach(function(provider, index) {
-                        const valueScore = calculateValueScore(provider);
-                        
-                        html += '<div class="provider-card">';
-                        html += '<div class="provider-header">';
-                        html += '<h3 class="provider-name">' + (index + 1) + '. ' + provider.provider_name + '</h3>';
-                        html += '<div>';
-                        if (provider.average_rating) {
-                            html += '<span class="rating-badge">⭐ ' + provider.average_rating.toFixed(1) + '/10</span> ';
-                        }
-                        html += '<span class="value-score">Value: ' + valueScore + '</span>';
-                        html += '</div>';
-                        html += '</div>';
-                        
-                        html += '<div class="provider-details">';
-                        html += '<div class="detail-item"><span class="icon">📍</span>' + provider.provider_city + ', ' + provider.provider_state + ' ' + provider.provider_zip_code + '</div>';
-                        if (provider.distance_km) {
-                            html += '<div class="detail-item"><span class="icon">📏</span>' + provider.distance_km + ' km away</div>';
-                        }
-                        html += '<div class="detail-item"><span class="icon">🏥</span>' + provider.ms_drg_definition + '</div>';
-                        html += '<div class="detail-item"><span class="icon cost-highlight">💰</span><span class="cost-highlight">$' + provider.average_covered_charges.toLocaleString('en-US', {maximumFractionDigits: 0}) + '</span></div>';
-                        if (provider.total_discharges > 0) {
-                            html += '<div class="detail-item"><span class="icon">📊</span>' + provider.total_discharges + ' procedures/year</div>';
-                        }
-                        html += '</div>';
-                        html += '</div>';
-                    });
-                    html += '</div>';
-                    document.getElementById('results').innerHTML = html;
-                } else {
-                    document.getElementById('results').innerHTML = 
-                        '<div class="results">No results found. Try a different search or larger radius.</div>';
-                }
-            }
-            
-            function showAnswer(answer) {
-                hideLoading();
-                document.getElementById('results').innerHTML = 
-                    '<div class="answer">🤖 ' + answer + '</div>';
-            }
-            
-            document.getElementById('searchForm').addEventListener('submit', async (e) => {
-                e.preventDefault();
-                showLoading();
-                
-                const formData = new FormData(e.target);
-                const params = new URLSearchParams();
-                for (let [key, value] of formData.entries()) {
-                    if (value) params.append(key, value);
-                }
-                
-                try {
-                    const response = await fetch('/providers?' + params);
-                    if (!response.ok) {
-                        const error = await response.json();
-                        throw new Error(error.detail || 'Search failed');
-                    }
-                    const data = await response.json();
-                    showResults(data);
-                } catch (error) {
-                    showError(error.message);
-                }
-            });
-            
-            document.getElementById('askForm').addEventListener('submit', async (e) => {
-                e.preventDefault();
-                showLoading();
-                
-                const question = document.getElementById('question').value.trim();
-                if (!question) {
-                    showError('Please enter a question');
-                    return;
-                }
-                
-                try {
-                    const response = await fetch('/ask', {
-                        method: 'POST',
-                        headers: {'Content-Type': 'application/json'},
-                        body: JSON.stringify({question: question})
-                    });
-                    
-                    if (!response.ok) {
-                        const error = await response.json();
-                        throw new Error(error.detail || 'AI request failed');
-                    }
-                    
-                    const answer = await response.text();
-                    showAnswer(answer);
-                } catch (error) {
-                    showError(error.message);
-                }
-            });
-        </script>
-    </body>
-    </html>
-    """
-    return html_content
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or _ROOT_ETAG in if_none_match):
+        return _ROOT_NOT_MODIFIED
+    
+    accept_encoding = request.headers.get("accept-encoding", "")
+    if _ROOT_BR_RESPONSE is not None and "br" in accept_encoding:
+        return _ROOT_BR_RESPONSE
+    if "gzip" in accept_encoding:
+        return _ROOT_GZ_RESPONSE
+    return _ROOT_RESPONSE
+
+
+# These endpoints return pre-serialized responses; the schema is declared for
+# the OpenAPI docs only, so FastAPI doesn't build a validating response field
+_PROVIDER_LIST_DOCS = {200: {"model": List[ProviderResponse]}}
 
+# Error replies are constant; build them once (same bodies HTTPException
+# would produce) instead of raising through the exception handlers
+_SEARCH_ERROR_RESPONSE = ORJSONResponse(
+    {"detail": "Internal server error during provider search"}, status_code=500
+)
+_ASK_ERROR_RESPONSE = PlainTextResponse(
+    "I encountered an error processing your question. Please try again with a specific question about hospital costs or quality."
+)
+_ASK_JSON_ERROR_RESPONSE = ORJSONResponse(
+    {"detail": "Internal server error during AI processing"}, status_code=500
+)
 
-@app.get("/providers", response_model=List[ProviderResponse])
+@app.get("/providers", response_model=None, responses=_PROVIDER_LIST_DOCS)
 async def search_providers(
-    drg: str = Query(..., description="MS-DRG code or description", example="470"),
-    zip_code: str = Query(..., description="ZIP code for search center", alias="zip", example="10001"),
+    drg: str = Query(..., description="MS-DRG code or description", example="470", pattern=r"\S"),
+    zip_code: str = Query(..., description="ZIP code for search center", alias="zip", example="10001", pattern=ZIP_CODE_PATTERN),
     radius_km: int = Query(50, description="Search radius in kilometers", ge=1, le=500),
-    limit: int = Query(50, description="Maximum number of results", ge=1, le=100),
-    db: AsyncSession = Depends(get_db)
+    limit: int = Query(50, description="Maximum number of results", ge=1, le=100)
 ):
     """
     Search for healthcare providers with enhanced multi-factor ranking
     Returns providers ranked by composite value score (cost + quality + distance + experience)
     """
     try:
-        if not drg.strip():
-            raise HTTPException(status_code=400, detail="DRG parameter cannot be empty")
-        if not zip_code.strip():
-            raise HTTPException(status_code=400, detail="ZIP code parameter cannot be empty")
-        if not zip_code.replace('-', '').isdigit() or len(zip_code.split('-')[0]) != 5:
-            raise HTTPException(status_code=400, detail="Invalid ZIP code format")
+        drg = drg.strip()
         
-        logger.info(f"Enhanced provider search: DRG={drg}, ZIP={zip_code}, Radius={radius_km}km")
+        logger.info("Enhanced provider search: DRG=%s, ZIP=%s, Radius=%dkm", drg, zip_code, radius_km)
         
-        results = await provider_service.search_providers(db, drg.strip(), zip_code, radius_km, limit)
+        payload = await _search_payload(drg, zip_code, radius_km, limit)
         
-        logger.info(f"Returning {len(results)} results with composite ranking")
-        return results
+        # The rows were validated once, when the service built them
+        return Response(content=payload, media_type="application/json")
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error in search_providers: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error during provider search")
+        logger.error("Error in search_providers: %s", e)
+        return _SEARCH_ERROR_RESPONSE
+
+
+@app.get("/providers/stream")
+async def stream_providers(
+    drg: str = Query(..., description="MS-DRG code or description", example="470", pattern=r"\S"),
+    zip_code: str = Query(..., description="ZIP code for search center", alias="zip", example="10001", pattern=ZIP_CODE_PATTERN),
+    radius_km: int = Query(50, description="Search radius in kilometers", ge=1, le=500),
+    limit: int = Query(50, description="Maximum number of results", ge=1, le=100)
+):
+    """
+    Same ranked search as /providers, streamed as newline-delimited JSON
+    (one provider object per line)
+    """
+    drg = drg.strip()
+    return StreamingResponse(
+        _ndjson_search(drg, zip_code, radius_km, limit),
+        media_type="application/x-ndjson",
+    )
+
+
+async def _ndjson_search(drg: str, zip_code: str, radius_km: int, limit: int) -> AsyncIterator[bytes]:
+    """
+    Serialize providers one line at a time as the client reads them, from the
+    search cache when warm or straight off the service's ranked iterator.
+    Rows are cached only once the search has completed; a search error ends
+    the response without caching anything.
+    """
+    key = _search_key(drg, zip_code, radius_km, limit)
+    rows = provider_search_cache.get(key)
+    if rows is not None:
+        for row in rows:
+            yield orjson.dumps(row) + b"\n"
+        return
+    
+    rows = []
+    async with ro_engine.connect() as conn:
+        async for result in provider_service.search_providers_iter(conn, drg, zip_code, radius_km, limit):
+            row = result.model_dump(mode="json")
+            rows.append(row)
+            yield orjson.dumps(row) + b"\n"
+    provider_search_cache.set(key, rows)
 
 
+# Identical questions asked concurrently share one LLM round-trip
+_ask_inflight = SingleFlight()
+
+# Answers to near-duplicate questions, matched by embedding similarity
+# within the same extracted entities (ZIP, DRG, radius...), so "near 10001"
+# never answers "near 94110"; ASK_SEMANTIC_CACHE_SIZE=0 turns it off (and
+# skips the embedding call)
+ASK_SEMANTIC_CACHE_SIZE = int(os.getenv("ASK_SEMANTIC_CACHE_SIZE", "10000"))
+ask_semantic_cache = SemanticCache(
+    maxsize=ASK_SEMANTIC_CACHE_SIZE,
+    threshold=float(os.getenv("ASK_SEMANTIC_THRESHOLD", "0.95")),
+    ttl=float(os.getenv("ASK_SEMANTIC_CACHE_TTL_S", "3600")),
+) if ASK_SEMANTIC_CACHE_SIZE > 0 else None
+
+async def _process_question(question: str) -> AskResponse:
+    """
+    Run the LLM pipeline on a session of its own: the call is shared by every
+    request asking the same question, so it can't use (or be cancelled with)
+    the session of the one that started it
+    """
+    async with ReadOnlyTxSessionLocal() as db:
+        return await ai_service.process_question(db, question)
+
+async def _answer_question(question: str) -> AskResponse:
+    """
+    Process a question, reusing the answer to a near-identical earlier
+    question or coalescing with an identical one already in flight
+    """
+    embedding = None
+    if ask_semantic_cache is not None:
+        scope = ai_service.cache_scope(question)
+        try:
+            embedding = await ai_service.embed(question)
+        except Exception as e:
+            logger.warning("Question embedding failed, skipping semantic cache: %s", e)
+        else:
+            cached = ask_semantic_cache.get(embedding, scope)
+            if cached is not None:
+                return cached
+    
+    key = " ".join(question.lower().split())
+    response = await _ask_inflight.do(key, lambda: _process_question(question))
+    
+    # Only answers backed by data are worth reusing; the fallback and error
+    # messages carry no rows
+    if embedding is not None and response.data_used:
+        ask_semantic_cache.set(embedding, response, scope)
+    return response
+
 @app.post("/ask", response_class=PlainTextResponse)
-async def ask_ai_assistant(request: AskRequest, db: AsyncSession = Depends(get_db)):
+async def ask_ai_assistant(request: AskRequest):
     """
     AI assistant with intent-aware ranking
     Automatically detects if user wants cheapest, best-rated, nearest, or best value
     """
     try:
-        if not request.question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        if len(request.question) > 1000:
-            raise HTTPException(status_code=400, detail="Question too long (max 1000 characters)")
-        
-        logger.info(f"AI assistant query: {request.question}")
+        logger.info("AI assistant query: %s", request.question)
         
-        response = await ai_service.process_question(db, request.question.strip())
+        response = await _answer_question(request.question)
         
-        logger.info(f"AI response generated successfully")
-        return response.answer
+        logger.info("AI response generated successfully")
+        return Response(content=response.answer_bytes, media_type="text/plain")
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error in ask_ai_assistant: {e}")
-        return "I encountered an error processing your question. Please try again with a specific question about hospital costs or quality."
+        logger.error("Error in ask_ai_assistant: %s", e)
+        return _ASK_ERROR_RESPONSE
+
+
+@app.post("/ask-stream", response_class=StreamingResponse)
+async def ask_ai_assistant_stream(request: AskRequest):
+    """
+    Same answer as /ask, streamed as plain text while the LLM generates it
+    """
+    return StreamingResponse(_stream_answer(request.question), media_type="text/plain")
+
+
+async def _stream_answer(question: str) -> AsyncIterator[bytes]:
+    """
+    Answer text as it is generated; a near-duplicate question already in the
+    semantic cache is answered at once. Opens its own session, since the
+    body is produced after the endpoint has returned.
+    """
+    try:
+        if ask_semantic_cache is not None:
+            scope = ai_service.cache_scope(question)
+            cached = ask_semantic_cache.get(await ai_service.embed(question), scope)
+            if cached is not None:
+                yield cached.answer_bytes
+                return
+    except Exception as e:
+        logger.warning("Question embedding failed, skipping semantic cache: %s", e)
+    
+    try:
+        async with ReadOnlyTxSessionLocal() as db:
+            async for chunk in ai_service.stream_question(db, question):
+                yield chunk.encode()
+    except Exception as e:
+        logger.error("Error in ask_ai_assistant_stream: %s", e)
+        yield _ASK_ERROR_RESPONSE.body
 
 
-@app.post("/ask-json", response_model=AskResponse)
-async def ask_ai_assistant_json(request: AskRequest, db: AsyncSession = Depends(get_db)):
+@app.post("/ask-json", response_model=None, responses={200: {"model": AskResponse}})
+async def ask_ai_assistant_json(request: AskRequest):
     """
     AI assistant JSON response with enhanced debugging information
     """
     try:
-        if not request.question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        if len(request.question) > 1000:
-            raise HTTPException(status_code=400, detail="Question too long (max 1000 characters)")
-        
-        response = await ai_service.process_question(db, request.question.strip())
-        return response
+        response = await _answer_question(request.question)
+        # AskResponse was validated when the service built it; its cached
+        # orjson body skips re-validating (and re-encoding) every data_used row
+        return Response(content=response.json_bytes, media_type="application/json")
         
-    except HTTPException:
-        raise
     except Exception as e:
-        logger.error(f"Error in ask_ai_assistant_json: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error during AI processing")
+        logger.error("Error in ask_ai_assistant_json: %s", e)
+        return _ASK_JSON_ERROR_RESPONSE
+
 
+# Planner row estimate: a catalog lookup instead of a full scan of providers.
+# -1 means the table was never vacuumed/analyzed, so fall back to counting.
+_PROVIDER_ESTIMATE_SQL = text(
+    "SELECT reltuples::bigint FROM pg_class WHERE oid = 'providers'::regclass"
+)
+
+async def _health_counts() -> dict:
+    """
+    Provider count (estimated on PostgreSQL) and rating summary for /health,
+    on one bare connection: a single pool slot and no Session around it
+    """
+    async with ro_engine.connect() as conn:
+        provider_count = None
+        if IS_POSTGRES:
+            estimate = (await conn.execute(_PROVIDER_ESTIMATE_SQL)).scalar()
+            if estimate is not None and estimate >= 0:
+                provider_count = estimate
+        if provider_count is None:
+            provider_count = (await conn.execute(select(func.count(Provider.id)))).scalar()
+        
+        result = await conn.execute(select(func.count(Rating.id), func.avg(Rating.rating)))
+        total_ratings, average_rating = result.one()
+    
+    return {
+        "providers_in_db": provider_count,
+        "total_ratings": total_ratings,
+        "average_rating": round(average_rating or 0, 1),
+    }
 
 @app.get("/health")
-async def health_check(db: AsyncSession = Depends(get_db)):
+async def health_check():
     """Enhanced health check with database statistics"""
     try:
-        # Check basic connectivity
-        result = await db.execute(select(func.count(Provider.id)))
-        provider_count = result.scalar()
-        
-        # Get basic stats
-        stats = await provider_service.get_provider_statistics(db)
+        # Probes arrive every few seconds; only recount once per TTL
+        counts = health_counts_cache.get("counts")
+        if counts is None:
+            counts = await _health_counts()
+            health_counts_cache.set("counts", counts)
         
         return {
             "status": "healthy",
             "database": "connected",
-            "providers_in_db": provider_count,
-            "total_ratings": stats.get('total_ratings', 0),
-            "average_rating": stats.get('average_rating', 0),
+            **counts,
             "ranking_algorithm": "composite (cost 40% + rating 35% + distance 15% + volume 10%)",
+            "provider_search_cache": provider_search_cache.stats(),
             "version": "1.0.0"
         }
     except Exception as e:
-        logger.error(f"Health check failed: {e}")
+        logger.error("Health check failed: %s", e)
         raise HTTPException(status_code=503, detail="Service unhealthy")
 
 
+# Ranking description appended to /stats; never changes at runtime
+_STATIC_STATS = {
+    "ranking_algorithm": {
+        "type": "composite_scoring",
+        "weights": {
+            "cost_effectiveness": 0.4,
+            "quality_rating": 0.35,
+            "distance_preference": 0.15,
+            "volume_experience": 0.1
+        },
+        "description": "Multi-factor ranking balancing cost, quality, proximity, and experience"
+    },
+    "search_features": {
+        "enhanced_drg_matching": "Medical synonyms and fuzzy matching",
+        "intent_detection": "Automatic optimization for cheapest/best-rated/nearest/value queries",
+        "fallback_searches": "Broader geographic and procedure searches when no exact matches"
+    }
+}
+
+# /stats body, rebuilt in the background every STATS_REFRESH_S seconds
+STATS_REFRESH_S = float(os.getenv("STATS_REFRESH_S", "60"))
+_stats_body: bytes = b""
+_STATS_HEADERS = {"Cache-Control": f"public, max-age={int(STATS_REFRESH_S)}"}
+_stats_task: "asyncio.Task | None" = None
+
+async def _build_stats_body() -> bytes:
+    """Query the provider statistics and serialize them with the static block"""
+    global _stats_body
+    async with ReadOnlySessionLocal() as db:
+        stats = await provider_service.get_provider_statistics(db)
+    stats.update(_STATIC_STATS)
+    _stats_body = orjson.dumps(stats)
+    return _stats_body
+
+async def _refresh_stats_forever():
+    """Keep the /stats body fresh; a failed refresh keeps serving the last one"""
+    while True:
+        await asyncio.sleep(STATS_REFRESH_S)
+        try:
+            await _build_stats_body()
+        except Exception as e:
+            logger.error("Error refreshing statistics: %s", e)
+
+# provider_ratings_mv backs every per-provider average (search, /top-rated,
+# /cheapest). etl.py refreshes it after loading ratings; this also picks up
+# ratings written by anything else, at most RATING_VIEW_REFRESH_S seconds late.
+# Every worker runs the loop, woken on the same wall-clock boundaries, and the
+# refresh's advisory lock lets one of them do the work each interval.
+RATING_VIEW_REFRESH_S = float(os.getenv("RATING_VIEW_REFRESH_S", "300"))
+_rating_view_task: "asyncio.Task | None" = None
+
+async def _refresh_rating_view_forever():
+    """Periodically recompute provider_ratings_mv (errors are logged by the refresh)"""
+    while True:
+        await asyncio.sleep(RATING_VIEW_REFRESH_S - time.time() % RATING_VIEW_REFRESH_S)
+        await refresh_rating_view(skip_if_busy=True)
+
 @app.get("/stats")
-async def get_statistics(db: AsyncSession = Depends(get_db)):
+async def get_statistics():
     """Get comprehensive database and ranking statistics"""
     try:
-        stats = await provider_service.get_provider_statistics(db)
-        
-        # Add ranking algorithm info
-        stats.update({
-            "ranking_algorithm": {
-                "type": "composite_scoring",
-                "weights": {
-                    "cost_effectiveness": 0.4,
-                    "quality_rating": 0.35,
-                    "distance_preference": 0.15,
-                    "volume_experience": 0.1
-                },
-                "description": "Multi-factor ranking balancing cost, quality, proximity, and experience"
-            },
-            "search_features": {
-                "enhanced_drg_matching": "Medical synonyms and fuzzy matching",
-                "intent_detection": "Automatic optimization for cheapest/best-rated/nearest/value queries",
-                "fallback_searches": "Broader geographic and procedure searches when no exact matches"
-            }
-        })
-        
-        return stats
+        # Built on first use, then kept current by the background task
+        body = _stats_body or await _build_stats_body()
+        return Response(content=body, media_type="application/json", headers=_STATS_HEADERS)
     except Exception as e:
-        logger.error(f"Error getting statistics: {e}")
+        logger.error("Error getting statistics: %s", e)
         raise HTTPException(status_code=500, detail="Error retrieving statistics")
 
 
+# The examples payload never changes at runtime - serialize it once and let
+# clients and proxies keep it for as long as the landing page
+_EXAMPLES_HEADERS = {"Cache-Control": "public, max-age=3600"}
+_EXAMPLES_JSON = orjson.dumps({
+    "examples": ai_service.get_example_prompts(),
+    "intents_supported": [
+        "cheapest - focuses on cost optimization",
+        "best_rated - prioritizes quality ratings", 
+        "nearest - emphasizes proximity",
+        "value - balances cost, quality, distance, and experience (default)"
+    ],
+    "ranking_explanation": "The system automatically detects your intent and optimizes results accordingly"
+})
+
 @app.get("/examples")
 async def get_example_prompts():
     """Get enhanced example prompts covering different query intents"""
-    try:
-        examples = ai_service.get_example_prompts()
-        return {
-            "examples": examples,
-            "intents_supported": [
-                "cheapest - focuses on cost optimization",
-                "best_rated - prioritizes quality ratings", 
-                "nearest - emphasizes proximity",
-                "value - balances cost, quality, distance, and experience (default)"
-            ],
-            "ranking_explanation": "The system automatically detects your intent and optimizes results accordingly"
-        }
-    except Exception as e:
-        logger.error(f"Error getting examples: {e}")
-        raise HTTPException(status_code=500, detail="Error retrieving examples")
+    return Response(content=_EXAMPLES_JSON, media_type="application/json", headers=_EXAMPLES_HEADERS)
 
 
 # Additional endpoints for debugging and monitoring
-@app.get("/top-rated")
+@app.get("/top-rated", response_model=None, responses=_PROVIDER_LIST_DOCS)
 async def get_top_rated_providers(
     drg: str = Query(None, description="Optional DRG filter"),
     limit: int = Query(10, description="Number of results", ge=1, le=50),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """Get top-rated providers (for comparison with composite ranking)"""
     try:
         results = await provider_service.get_top_rated_providers(db, drg, limit)
-        return results
+        return ORJSONResponse(ProviderResponse.dump_many(results))
     except Exception as e:
-        logger.error(f"Error getting top rated providers: {e}")
+        logger.error("Error getting top rated providers: %s", e)
         raise HTTPException(status_code=500, detail="Error retrieving top rated providers")
 
 
-@app.get("/cheapest")
+@app.get("/cheapest", response_model=None, responses=_PROVIDER_LIST_DOCS)
 async def get_cheapest_providers(
     drg: str = Query(None, description="Optional DRG filter"),
     limit: int = Query(10, description="Number of results", ge=1, le=50),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_ro_db)
 ):
     """Get cheapest providers (for comparison with composite ranking)"""
     try:
         results = await provider_service.get_cheapest_providers(db, drg, limit)
-        return results
+        return ORJSONResponse(ProviderResponse.dump_many(results))
     except Exception as e:
-        logger.error(f"Error getting cheapest providers: {e}")
+        logger.error("Error getting cheapest providers: %s", e)
         raise HTTPException(status_code=500, detail="Error retrieving cheapest providers")
 
 
+# OpenAPI schema built once all routes are registered, so neither the first
+# docs visitor nor any later one pays for generating or serializing it
+_OPENAPI_BYTES = orjson.dumps(app.openapi())
+
+@app.get("/openapi.json", include_in_schema=False)
+async def openapi_schema():
+    return Response(content=_OPENAPI_BYTES, media_type="application/json")
+
+@app.get("/docs", include_in_schema=False)
+async def swagger_ui():
+    return get_swagger_ui_html(openapi_url="/openapi.json", title=f"{app.title} - Swagger UI")
+
+@app.get("/redoc", include_in_schema=False)
+async def redoc():
+    return get_redoc_html(openapi_url="/openapi.json", title=f"{app.title} - ReDoc")
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
\ No newline at end of file
+    try:
+        import uvloop  # libuv event loop; asyncpg is developed and tested against it
+        loop = "uvloop"
+    except ImportError:  # uvloop is not available on Windows
+        loop = "asyncio"
+    # Each worker owns its own engine pool: size WORKERS x (pool_size + max_overflow)
+    # to fit under the database's max_connections. The default is capped at 4
+    # (matching the Dockerfile's WEB_CONCURRENCY) so a many-core host doesn't
+    # multiply the pool past what Postgres or PgBouncer will accept
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        log_level=LOG_LEVEL.lower(),
+        loop=loop,
+        http="httptools",
+        workers=int(os.getenv("WORKERS") or max(2, min(os.cpu_count() or 1, 4))),
+        # Skip formatting a log record per request unless asked for
+        access_log=os.getenv("ACCESS_LOG", "false").lower() == "true",
+    )
\ No newline at end of file
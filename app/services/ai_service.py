@@ -1,26 +1,134 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+import httpx
 import openai
 import json
 import os
-from typing import Dict, List, Any, Optional
+from typing import AsyncIterator, Dict, List, Any, NamedTuple, Optional, Union
 import re
 import logging
 import math
+import numpy as np
 
 from app.schemas import AskResponse
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Prompts are laid out static-first: the fixed instructions form the system
+# message, byte-identical on every call, and everything that depends on the
+# question goes last. The LLM server can then serve the shared prefix from its
+# prompt cache (OpenAI prompt caching, vLLM --enable-prefix-caching) instead
+# of reprocessing it per question.
+
+# Intent-specific ordering for generated SQL
+SQL_ORDER_CLAUSES = {
+    'cheapest': 'ORDER BY p.average_covered_charges ASC',
+    'best_rated': 'ORDER BY AVG(r.rating) DESC',
+    'nearest': 'ORDER BY p.provider_zip_code ASC',  # Approximate
+    'value': '''ORDER BY (
+        (1000000 / GREATEST(p.average_covered_charges, 1000)) * 0.4 +
+        COALESCE(AVG(r.rating), 5.0) * 15 * 0.35 +
+        GREATEST(0, 100 - 50) * 0.15 +
+        LEAST(LOG(GREATEST(p.total_discharges, 1)) * 10, 50) * 0.1
+    ) DESC'''
+}
+
+SQL_SYSTEM_PROMPT = f"""
+You are a SQL expert for a healthcare database. Generate a PostgreSQL query for the user's question,
+with composite ranking when appropriate.
+
+Database Schema:
+
+providers table:
+- provider_id: CMS provider identifier (string)
+- provider_name: Hospital name (string)
+- provider_city: City name (string)
+- provider_state: State abbreviation (string, usually 'NY')
+- provider_zip_code: ZIP code (string)
+- ms_drg_definition: DRG procedure description (text)
+- total_discharges: Number of procedures performed (integer)
+- average_covered_charges: Hospital charges in dollars (float)
+- average_total_payments: Total payments in dollars (float)
+- average_medicare_payments: Medicare portion in dollars (float)
+- latitude: Geographic latitude (float)
+- longitude: Geographic longitude (float)
+
+ratings table:
+- provider_id: References providers.provider_id (string)
+- rating: Rating from 1.0 to 10.0 (float)
+- category: Rating category like 'overall', 'cardiac', 'orthopedic' (string)
+
+Enhanced DRG Codes:
+- 470: Major Joint Replacement (knee, hip)
+- 247: Percutaneous Cardiovascular Procedure
+- 292: Heart Failure & Shock
+- 690: Kidney & Urinary Tract Infections
+
+IMPORTANT RULES:
+1. Return ONLY the SQL query, no explanations or markdown
+2. Use proper JOIN syntax when combining tables: LEFT JOIN ratings r ON p.provider_id = r.provider_id
+3. For cost queries: {SQL_ORDER_CLAUSES['cheapest']}
+4. For rating queries: {SQL_ORDER_CLAUSES['best_rated']}
+5. For value queries: {SQL_ORDER_CLAUSES['value']}
+6. Use SMART geographic matching with LIKE patterns (e.g., provider_zip_code LIKE '100%')
+7. For DRG matching, use ms_drg_definition ILIKE with wildcards
+8. Always GROUP BY all non-aggregate columns when using aggregates
+9. LIMIT results to 20 or fewer
+10. Include ratings in SELECT when available: AVG(r.rating) as avg_rating
+"""
+
+ANSWER_SYSTEM_PROMPT = """
+You are a helpful healthcare assistant. Answer the user's question from the hospital data provided.
+
+Instructions:
+1. Give a direct, conversational answer optimized for the query intent
+2. Present these as the best available options (don't mention "exact matches" or "fallbacks")
+3. Include specific hospital names and key details
+4. Format costs as currency (e.g., $25,000)
+5. Mention ratings clearly (e.g., "8.5/10 rating")
+6. For value queries, explain the ranking factors (cost, quality, experience)
+7. Keep response concise but informative (3-5 sentences)
+8. Highlight the top 2-3 options based on the intent
+9. Don't mention technical database details or search limitations
+10. IMPORTANT: Use plain text formatting only - NO markdown, asterisks, or special formatting
+11. Write in natural paragraphs without bullet points or special characters
+"""
+
+BROADER_ANSWER_SYSTEM_PROMPT = """
+You are a helpful healthcare assistant. Present the hospital data provided as recommendations for the user's question.
+
+Provide a helpful response that:
+1. Presents these as the top recommendations (don't mention "broader area" or "exact location")
+2. Lists the top 2-3 options with names, locations, costs, and ratings
+3. Explains the ranking rationale based on the query intent
+4. Keeps it conversational and confident
+5. For nearby results, present them as the best available options
+6. IMPORTANT: Use plain text formatting only - NO markdown, asterisks, or special formatting
+7. Write in natural paragraphs without bullet points or special characters
+"""
+
+class RetrievedData(NamedTuple):
+    """Rows fetched for a question, still waiting for the answer text"""
+    intent: str
+    sql_query: str
+    data_used: List[Dict[str, Any]]
+
 class AIService:
-    def __init__(self):
+    def __init__(self, http_client: Optional[httpx.AsyncClient] = None):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = openai.AsyncOpenAI(api_key=api_key)
+        # OPENAI_BASE_URL can point at any OpenAI-compatible server (vLLM,
+        # TensorRT-LLM, llama.cpp) hosting a quantized model instead.
+        # http_client lets the app share one tuned connection pool.
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key,
+            base_url=os.getenv("OPENAI_BASE_URL") or None,
+            http_client=http_client,
+        )
+        self.chat_model = os.getenv("OPENAI_CHAT_MODEL", "gpt-4o-mini")
+        self.embedding_model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
         
         # Enhanced DRG mappings with more procedures
         self.drg_mappings = {
@@ -62,7 +170,45 @@ class AIService:
     async def process_question(self, db: AsyncSession, question: str) -> AskResponse:
         """Process natural language question with enhanced ranking consistency"""
         
-        logger.info(f"Processing question: {question}")
+        retrieved = await self._retrieve_data(db, question)
+        if isinstance(retrieved, AskResponse):
+            return retrieved
+        
+        try:
+            # Generate natural language answer with intent consideration
+            answer = await self._generate_answer(question, retrieved.data_used, retrieved.intent)
+            
+            return AskResponse(
+                answer=answer,
+                sql_query=retrieved.sql_query,
+                data_used=retrieved.data_used[:10]  # Limit to first 10 results for response
+            )
+            
+        except Exception as e:
+            logger.error("Error processing question: %s", e)
+            return self._processing_error_response()
+    
+    async def stream_question(self, db: AsyncSession, question: str) -> AsyncIterator[str]:
+        """
+        Same as process_question, but yield the answer text as the LLM
+        produces it, so the first words arrive before the completion finishes
+        """
+        retrieved = await self._retrieve_data(db, question)
+        if isinstance(retrieved, AskResponse):
+            yield retrieved.answer
+            return
+        
+        async for chunk in self._stream_answer(question, retrieved.data_used, retrieved.intent):
+            yield chunk
+    
+    async def _retrieve_data(self, db: AsyncSession, question: str) -> Union[AskResponse, RetrievedData]:
+        """
+        Generate and run the SQL for a question. Returns the rows to answer
+        from, or a finished AskResponse when there is nothing left to generate
+        (out of scope, no SQL, query errors, fallback searches, no results).
+        """
+        
+        logger.info("Processing question: %s", question)
         
         # Check if question is in scope
         if not self._is_healthcare_related(question):
@@ -86,7 +232,7 @@ class AIService:
                     data_used=None
                 )
             
-            logger.info(f"Generated SQL: {sql_query}")
+            logger.info("Generated SQL: %s", sql_query)
             
             # Execute the SQL query safely
             try:
@@ -94,7 +240,7 @@ class AIService:
                 rows = result.fetchall()
                 columns = list(result.keys()) if result.keys() else []
             except Exception as sql_error:
-                logger.error(f"SQL execution error: {sql_error}")
+                logger.error("SQL execution error: %s", sql_error)
                 return AskResponse(
                     answer="I encountered an error with the database query. Please try rephrasing your question or ask about specific procedures like knee replacement or heart surgery.",
                     sql_query=sql_query,
@@ -131,22 +277,45 @@ class AIService:
             if intent == 'value' and data_used:
                 data_used = self._apply_composite_ranking(data_used)
             
-            # Generate natural language answer with intent consideration
-            answer = await self._generate_answer(question, data_used, intent)
-            
-            return AskResponse(
-                answer=answer,
-                sql_query=sql_query,
-                data_used=data_used[:10]  # Limit to first 10 results for response
-            )
+            return RetrievedData(intent, sql_query, data_used)
             
         except Exception as e:
-            logger.error(f"Error processing question: {e}")
-            return AskResponse(
-                answer="I encountered an error processing your question. Please try asking about specific hospitals, procedures, or costs. For example: 'Find cheap hospitals for knee surgery in NYC'",
-                sql_query=None,
-                data_used=None
-            )
+            logger.error("Error processing question: %s", e)
+            return self._processing_error_response()
+    
+    @staticmethod
+    def _processing_error_response() -> AskResponse:
+        """Reply used when answering a question fails unexpectedly"""
+        return AskResponse(
+            answer="I encountered an error processing your question. Please try asking about specific hospitals, procedures, or costs. For example: 'Find cheap hospitals for knee surgery in NYC'",
+            sql_query=None,
+            data_used=None
+        )
+
+    async def aclose(self) -> None:
+        """Close the HTTP connections to the LLM backend"""
+        await self.client.close()
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Unit-length embedding of the text, so a dot product is cosine similarity"""
+        response = await self.client.embeddings.create(model=self.embedding_model, input=text)
+        vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def cache_scope(self, question: str) -> tuple:
+        """
+        Entities a cached answer is specific to: intent, location, procedure
+        codes, and every number in the question (ZIP, DRG, radius). Questions
+        that embed almost identically but differ in any of these must not
+        share an answer.
+        """
+        location = self._extract_location_info(question)
+        return (
+            self._detect_query_intent(question),
+            tuple(sorted(location.items())),
+            tuple(sorted(self._extract_procedure_info(question))),
+            tuple(re.findall(r'\d+', question)),
+        )
 
     def _detect_query_intent(self, question: str) -> str:
         """Detect the intent of the user's query for better ranking"""
@@ -192,7 +361,7 @@ class AIService:
                        distance_score * 0.15 + volume_score * 0.1)
                        
             except Exception as e:
-                logger.error(f"Error calculating score: {e}")
+                logger.error("Error calculating score: %s", e)
                 return 0.0
         
         return sorted(data, key=calculate_score, reverse=True)
@@ -311,7 +480,7 @@ class AIService:
                         data_used=data_used[:5]
                     )
             except Exception as e:
-                logger.error(f"Fallback query failed: {e}")
+                logger.error("Fallback query failed: %s", e)
                 continue
         
         return None
@@ -376,7 +545,7 @@ class AIService:
             
             data_summary = json.dumps(formatted_data, indent=2)
         except Exception as e:
-            logger.error(f"Error formatting broader search data: {e}")
+            logger.error("Error formatting broader search data: %s", e)
             data_summary = str(data[:3])
         
         intent_context = {
@@ -388,28 +557,20 @@ class AIService:
         
         prompt = f"""
         The user asked: {question}
+        Query Intent: {intent}
         
         Here are the best {intent_context} in the New York area:
         
         {data_summary}
         
-        Provide a helpful response that:
-        1. Presents these as the top recommendations (don't mention "broader area" or "exact location")
-        2. Lists the top 2-3 options with names, locations, costs, and ratings
-        3. Explains the ranking rationale based on the query intent: {intent}
-        4. Keeps it conversational and confident
-        5. For nearby results, present them as the best available options
-        6. IMPORTANT: Use plain text formatting only - NO markdown, asterisks, or special formatting
-        7. Write in natural paragraphs without bullet points or special characters
-        
         Answer:
         """
         
         try:
             response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
+                model=self.chat_model,
                 messages=[
-                    {"role": "system", "content": f"You are a helpful healthcare assistant. Focus on {intent_context} when presenting results."},
+                    {"role": "system", "content": BROADER_ANSWER_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=350,
@@ -419,7 +580,7 @@ class AIService:
             return response.choices[0].message.content.strip()
             
         except Exception as e:
-            logger.error(f"Error generating broader search answer: {e}")
+            logger.error("Error generating broader search answer: %s", e)
             return f"I couldn't find matches in your exact location, but found {len(data)} {intent_context} in the broader area. The top choice is {data[0].get('provider_name', 'N/A')} at ${data[0].get('average_covered_charges', 0):,.2f}."
     
     def _is_healthcare_related(self, question: str) -> bool:
@@ -513,48 +674,6 @@ class AIService:
         location_info = self._extract_location_info(question)
         procedure_info = self._extract_procedure_info(question)
         
-        # Intent-specific ordering
-        order_clauses = {
-            'cheapest': 'ORDER BY p.average_covered_charges ASC',
-            'best_rated': 'ORDER BY AVG(r.rating) DESC',
-            'nearest': 'ORDER BY p.provider_zip_code ASC',  # Approximate
-            'value': '''ORDER BY (
-                (1000000 / GREATEST(p.average_covered_charges, 1000)) * 0.4 +
-                COALESCE(AVG(r.rating), 5.0) * 15 * 0.35 +
-                GREATEST(0, 100 - 50) * 0.15 +
-                LEAST(LOG(GREATEST(p.total_discharges, 1)) * 10, 50) * 0.1
-            ) DESC'''
-        }
-        
-        schema_info = """
-        Database Schema:
-        
-        providers table:
-        - provider_id: CMS provider identifier (string)
-        - provider_name: Hospital name (string)
-        - provider_city: City name (string)
-        - provider_state: State abbreviation (string, usually 'NY')
-        - provider_zip_code: ZIP code (string)
-        - ms_drg_definition: DRG procedure description (text)
-        - total_discharges: Number of procedures performed (integer)
-        - average_covered_charges: Hospital charges in dollars (float)
-        - average_total_payments: Total payments in dollars (float)
-        - average_medicare_payments: Medicare portion in dollars (float)
-        - latitude: Geographic latitude (float)
-        - longitude: Geographic longitude (float)
-        
-        ratings table:
-        - provider_id: References providers.provider_id (string)
-        - rating: Rating from 1.0 to 10.0 (float)
-        - category: Rating category like 'overall', 'cardiac', 'orthopedic' (string)
-        
-        Enhanced DRG Codes:
-        - 470: Major Joint Replacement (knee, hip)
-        - 247: Percutaneous Cardiovascular Procedure
-        - 292: Heart Failure & Shock
-        - 690: Kidney & Urinary Tract Infections
-        """
-        
         context = f"""
         Extracted Information:
         - Location: {location_info}
@@ -572,37 +691,21 @@ class AIService:
         }
         
         prompt = f"""
-        You are a SQL expert for a healthcare database. Generate a PostgreSQL query for this question.
-        
-        {schema_info}
-        
         {context}
         
         INTENT GUIDANCE: {intent_guidance.get(intent, 'Balance multiple factors for best results.')}
         
-        IMPORTANT RULES:
-        1. Return ONLY the SQL query, no explanations or markdown
-        2. Use proper JOIN syntax when combining tables: LEFT JOIN ratings r ON p.provider_id = r.provider_id
-        3. For cost queries: {order_clauses.get('cheapest', 'ORDER BY p.average_covered_charges ASC')}
-        4. For rating queries: {order_clauses.get('best_rated', 'ORDER BY AVG(r.rating) DESC')}
-        5. For value queries: {order_clauses.get('value', 'Use composite scoring')}
-        6. Use SMART geographic matching with LIKE patterns (e.g., provider_zip_code LIKE '100%')
-        7. For DRG matching, use ms_drg_definition ILIKE with wildcards
-        8. Always GROUP BY all non-aggregate columns when using aggregates
-        9. LIMIT results to 20 or fewer
-        10. Include ratings in SELECT when available: AVG(r.rating) as avg_rating
-        
         Query Intent: {intent}
-        Suggested ORDER BY: {order_clauses.get(intent, order_clauses['value'])}
+        Suggested ORDER BY: {SQL_ORDER_CLAUSES.get(intent, SQL_ORDER_CLAUSES['value'])}
         
         SQL Query:
         """
         
         try:
             response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
+                model=self.chat_model,
                 messages=[
-                    {"role": "system", "content": f"Generate SQL optimized for {intent} queries with composite ranking when appropriate."},
+                    {"role": "system", "content": SQL_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=800,
@@ -619,20 +722,20 @@ class AIService:
             
             # Basic validation
             if not sql_query.upper().startswith('SELECT'):
-                logger.warning(f"Generated query doesn't start with SELECT: {sql_query}")
+                logger.warning("Generated query doesn't start with SELECT: %s", sql_query)
                 return None
             
             # Security check
             dangerous_keywords = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE', 'TRUNCATE']
             sql_upper = sql_query.upper()
             if any(keyword in sql_upper for keyword in dangerous_keywords):
-                logger.warning(f"Generated query contains dangerous keywords: {sql_query}")
+                logger.warning("Generated query contains dangerous keywords: %s", sql_query)
                 return None
             
             return sql_query
             
         except Exception as e:
-            logger.error(f"Error generating SQL: {e}")
+            logger.error("Error generating SQL: %s", e)
             return None
     
     async def _generate_answer(self, question: str, data: List[Dict[str, Any]], intent: str) -> str:
@@ -641,6 +744,50 @@ class AIService:
         if not data:
             return "I couldn't find any matching results for your question."
         
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.chat_model,
+                messages=self._answer_messages(question, data, intent),
+                max_tokens=400,
+                temperature=0.3
+            )
+            
+            return response.choices[0].message.content.strip()
+            
+        except Exception as e:
+            logger.error("Error generating answer: %s", e)
+            return self._fallback_answer(data, intent)
+    
+    async def _stream_answer(self, question: str, data: List[Dict[str, Any]], intent: str) -> AsyncIterator[str]:
+        """Streaming variant of _generate_answer, yielding text deltas"""
+        
+        if not data:
+            yield "I couldn't find any matching results for your question."
+            return
+        
+        started = False
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.chat_model,
+                messages=self._answer_messages(question, data, intent),
+                max_tokens=400,
+                temperature=0.3,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    started = True
+                    yield chunk.choices[0].delta.content
+            
+        except Exception as e:
+            logger.error("Error streaming answer: %s", e)
+            # Text already sent can't be replaced; only fall back before it
+            if not started:
+                yield self._fallback_answer(data, intent)
+    
+    def _answer_messages(self, question: str, data: List[Dict[str, Any]], intent: str) -> List[Dict[str, str]]:
+        """Chat messages asking the LLM to answer the question from the rows"""
+        
         try:
             # Enhanced data formatting with intent-specific presentation
             formatted_data = []
@@ -660,7 +807,7 @@ class AIService:
             
             data_summary = json.dumps(formatted_data, indent=2)
         except Exception as e:
-            logger.error(f"Error formatting data: {e}")
+            logger.error("Error formatting data: %s", e)
             data_summary = str(data[:3])
         
         intent_instructions = {
@@ -671,47 +818,25 @@ class AIService:
         }
         
         prompt = f"""
-        Based on the following hospital data, provide a helpful answer to the user's question.
-        
         User Question: {question}
         Query Intent: {intent}
+        Focus: {intent_instructions.get(intent, 'Provide balanced information')}
         
         Hospital Data:
         {data_summary}
         
-        Instructions:
-        1. Give a direct, conversational answer optimized for {intent} queries
-        2. {intent_instructions.get(intent, 'Provide balanced information')}
-        3. Present these as the best available options (don't mention "exact matches" or "fallbacks")
-        4. Include specific hospital names and key details
-        5. Format costs as currency (e.g., $25,000)
-        6. Mention ratings clearly (e.g., "8.5/10 rating")
-        7. For value queries, explain the ranking factors (cost, quality, experience)
-        8. Keep response concise but informative (3-5 sentences)
-        9. Highlight the top 2-3 options based on the intent
-        10. Don't mention technical database details or search limitations
-        11. IMPORTANT: Use plain text formatting only - NO markdown, asterisks, or special formatting
-        12. Write in natural paragraphs without bullet points or special characters
-        
         Answer:
         """
         
-        try:
-            response = await self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": f"You are a helpful healthcare assistant specializing in {intent} recommendations."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=400,
-                temperature=0.3
-            )
-            
-            return response.choices[0].message.content.strip()
-            
-        except Exception as e:
-            logger.error(f"Error generating answer: {e}")
-            return f"I found {len(data)} results for your {intent} query. The top option is {data[0].get('provider_name', 'N/A')} with charges of ${data[0].get('average_covered_charges', 0):,.2f} and a rating of {data[0].get('avg_rating', 'N/A')}/10."
+        return [
+            {"role": "system", "content": ANSWER_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
+    
+    @staticmethod
+    def _fallback_answer(data: List[Dict[str, Any]], intent: str) -> str:
+        """Templated answer used when the LLM call fails"""
+        return f"I found {len(data)} results for your {intent} query. The top option is {data[0].get('provider_name', 'N/A')} with charges of ${data[0].get('average_covered_charges', 0):,.2f} and a rating of {data[0].get('avg_rating', 'N/A')}/10."
     
     def get_example_prompts(self) -> List[str]:
         """Enhanced example prompts covering different intents"""
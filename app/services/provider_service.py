@@ -1,17 +1,55 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+from sqlalchemy import select, func, and_, or_, text, any_, literal, Text
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import selectinload
-from typing import List, Optional, Dict, Tuple
+from typing import AsyncIterator, List, Optional, Dict, Tuple, Union
+import heapq
 import math
+import numpy as np
 import logging
 
-from app.models import Provider, Rating
+from app.database import IS_POSTGRES
+from app.models import Provider, ProviderRatingView, Rating
 from app.schemas import ProviderResponse
 
-# Set up logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Average rating of the provider on each row, as a correlated subquery: the
+# outer query needs no GROUP BY over every provider column, and each lookup
+# is an index-only scan of idx_provider_rating_lookup (provider_id, rating)
+AVG_RATING = (
+    select(func.avg(Rating.rating))
+    .where(Rating.provider_id == Provider.provider_id)
+    .correlate(Provider)
+    .scalar_subquery()
+    .label('avg_rating')
+)
+
+# Ratings pre-aggregated per provider, for queries that rank by rating. On
+# PostgreSQL the provider_ratings_mv materialized view already holds them.
+if IS_POSTGRES:
+    RATING_AVERAGES = ProviderRatingView.__table__
+else:
+    RATING_AVERAGES = (
+        select(Rating.provider_id, func.avg(Rating.rating).label('avg_rating'))
+        .group_by(Rating.provider_id)
+        .subquery('rating_averages')
+    )
+
+# Provider columns copied as-is into ProviderResponse
+PROVIDER_RESPONSE_COLUMNS = (
+    'provider_id', 'provider_name', 'provider_city', 'provider_state',
+    'provider_zip_code', 'ms_drg_definition', 'total_discharges',
+    'average_covered_charges', 'average_total_payments', 'average_medicare_payments',
+)
+
+# Columns selected for result rows. Queries return plain Core rows rather than
+# Provider instances, so read-only results skip ORM hydration (identity map,
+# instance state) and come back as tuples with attribute access.
+PROVIDER_ROW_COLUMNS = tuple(
+    getattr(Provider, name) for name in PROVIDER_RESPONSE_COLUMNS + ('latitude', 'longitude')
+)
+
 class ProviderService:
     
     # Expanded ZIP coordinates for better geographic coverage
@@ -32,6 +70,9 @@ class ProviderService:
         '10128': (40.7816, -73.9509), '10280': (40.7081, -74.0173)
     }
     
+    # Rows fetched from the cursor and scored together per NumPy pass
+    SCORE_BATCH_SIZE = 500
+    
     # Medical procedure synonyms for better DRG matching
     PROCEDURE_SYNONYMS = {
         'knee': ['knee', 'joint', 'orthopedic', 'replacement', 'arthroplasty'],
@@ -50,7 +91,7 @@ class ProviderService:
     
     async def search_providers(
         self, 
-        db: AsyncSession, 
+        db: Union[AsyncSession, AsyncConnection], 
         drg: str, 
         zip_code: str, 
         radius_km: int, 
@@ -59,143 +100,185 @@ class ProviderService:
         """
         Enhanced provider search with improved ranking and reach
         """
+        return [provider async for provider in self.search_providers_iter(db, drg, zip_code, radius_km, limit)]
+    
+    async def search_providers_iter(
+        self, 
+        db: Union[AsyncSession, AsyncConnection], 
+        drg: str, 
+        zip_code: str, 
+        radius_km: int, 
+        limit: int = 50
+    ) -> AsyncIterator[ProviderResponse]:
+        """
+        Yield search results in ranked order. Only the best `limit` candidates
+        are kept while rows are read, so memory is bounded by the limit rather
+        than by the number of matches.
+        """
         try:
-            logger.info(f"Searching providers: DRG={drg}, ZIP={zip_code}, Radius={radius_km}km")
+            logger.info("Searching providers: DRG=%s, ZIP=%s, Radius=%skm", drg, zip_code, radius_km)
             
             # Get coordinates for the search ZIP code
             search_lat, search_lng = await self._get_zip_coordinates(db, zip_code)
             if not search_lat or not search_lng:
-                logger.warning(f"Could not find coordinates for ZIP {zip_code}")
+                logger.warning("Could not find coordinates for ZIP %s", zip_code)
                 search_lat, search_lng = 40.7128, -74.0060  # NYC fallback
             
-            logger.info(f"Search coordinates: {search_lat}, {search_lng}")
+            logger.info("Search coordinates: %s, %s", search_lat, search_lng)
             
             # Build enhanced query with ratings
-            query = (
-                select(Provider, func.avg(Rating.rating).label('avg_rating'))
-                .outerjoin(Rating, Provider.provider_id == Rating.provider_id)
-                .group_by(Provider.id)
-            )
+            query = self._select_with_rating()
             
             # Enhanced DRG matching with synonyms and fuzzy logic
             drg_conditions = self._build_drg_conditions(drg)
             if drg_conditions:
                 query = query.where(or_(*drg_conditions))
             
-            # Execute query to get all matching providers
-            result = await db.execute(query)
-            providers_with_ratings = result.all()
-            
-            logger.info(f"Found {len(providers_with_ratings)} providers matching DRG criteria")
-            
-            # Filter by radius and calculate enhanced scoring
-            filtered_providers = []
-            for provider, avg_rating in providers_with_ratings:
-                if provider.latitude and provider.longitude:
-                    distance = self._calculate_distance(
-                        search_lat, search_lng,
-                        provider.latitude, provider.longitude
-                    )
-                    
-                    if distance <= radius_km:
-                        provider_response = ProviderResponse(
-                            provider_id=provider.provider_id,
-                            provider_name=provider.provider_name,
-                            provider_city=provider.provider_city,
-                            provider_state=provider.provider_state,
-                            provider_zip_code=provider.provider_zip_code,
-                            ms_drg_definition=provider.ms_drg_definition,
-                            total_discharges=provider.total_discharges or 0,
-                            average_covered_charges=provider.average_covered_charges or 0.0,
-                            average_total_payments=provider.average_total_payments or 0.0,
-                            average_medicare_payments=provider.average_medicare_payments or 0.0,
-                            average_rating=round(avg_rating, 1) if avg_rating else None,
-                            distance_km=round(distance, 2)
+            # Let idx_location_search discard providers that can't be within
+            # the radius; the exact Haversine check below still applies
+            query = query.where(*self._bounding_box_conditions(search_lat, search_lng, radius_km))
+            
+            # Stream matching providers from the cursor so rows outside the
+            # radius are dropped as they arrive instead of being buffered
+            result = await db.stream(query)
+            matched_count = 0
+            in_radius_count = 0
+            
+            # Min-heap of (score, -arrival, provider) holding the current top
+            # `limit`; the arrival tiebreak keeps equal scores in query order,
+            # matching a stable descending sort
+            top_providers = []
+            async for rows in result.partitions(self.SCORE_BATCH_SIZE):
+                matched_count += len(rows)
+                batch = []
+                for row in rows:
+                    if row.latitude and row.longitude:
+                        distance = self._calculate_distance(
+                            search_lat, search_lng,
+                            row.latitude, row.longitude
                         )
-                        filtered_providers.append(provider_response)
-            
-            logger.info(f"Found {len(filtered_providers)} providers within {radius_km}km radius")
-            
-            # Enhanced multi-factor ranking
-            filtered_providers.sort(key=self._calculate_composite_score, reverse=True)
-            
-            return filtered_providers[:limit]
+                        
+                        if distance <= radius_km:
+                            batch.append(self._build_response(row, distance))
+                
+                # Enhanced multi-factor ranking, scored a batch at a time
+                scores = self._calculate_composite_scores(batch).tolist()
+                for score, provider_response in zip(scores, batch):
+                    in_radius_count += 1
+                    entry = (score, -in_radius_count, provider_response)
+                    if len(top_providers) < limit:
+                        heapq.heappush(top_providers, entry)
+                    elif entry > top_providers[0]:
+                        heapq.heapreplace(top_providers, entry)
+            
+            logger.info("Found %s providers matching DRG criteria", matched_count)
+            logger.info("Found %s providers within %skm radius", in_radius_count, radius_km)
+            
+            ranked = sorted(top_providers, key=lambda entry: entry[:2], reverse=True)
+            # Ship the score so clients can display it without redoing the math;
+            # responses are frozen, so this copies the handful of survivors
+            ranked = [
+                provider_response.model_copy(update={"value_score": round(score, 1)})
+                for score, _, provider_response in ranked
+            ]
             
         except Exception as e:
-            logger.error(f"Error in search_providers: {e}")
-            return []
+            # Callers cache what this yields; a failure must not look like
+            # an empty result
+            logger.error("Error in search_providers: %s", e)
+            raise
+        
+        for provider_response in ranked:
+            yield provider_response
+    
+    @staticmethod
+    def _build_response(row, distance: Optional[float] = None) -> ProviderResponse:
+        """
+        Response model read straight off a PROVIDER_ROW_COLUMNS + avg_rating
+        row, plus the search distance that the row doesn't carry. The row
+        comes from our own tables, so validation is skipped.
+        """
+        values = {field: getattr(row, field) for field in PROVIDER_RESPONSE_COLUMNS}
+        values['average_rating'] = row.avg_rating or None
+        values['distance_km'] = distance
+        return ProviderResponse.from_row_unchecked(values)
     
     def _build_drg_conditions(self, drg: str) -> List:
         """Build enhanced DRG matching conditions with synonyms"""
-        drg_conditions = []
+        patterns = [f"%{term}%" for term in self._drg_search_terms(drg)]
+        if not patterns:
+            return []
+        
+        if IS_POSTGRES:
+            # A single ILIKE ANY over one array parameter: one index-friendly
+            # predicate, and the same statement text for any number of terms
+            return [Provider.ms_drg_definition.ilike(any_(literal(patterns, ARRAY(Text))))]
+        return [Provider.ms_drg_definition.ilike(pattern) for pattern in patterns]
+    
+    def _drg_search_terms(self, drg: str) -> List[str]:
+        """Substrings to match against the DRG definition, expanded with synonyms"""
         drg_lower = drg.lower().strip()
         
         if drg.isdigit():
-            # Exact DRG code matching with multiple patterns
-            drg_conditions.append(Provider.ms_drg_definition.ilike(f"{drg} %"))
-            drg_conditions.append(Provider.ms_drg_definition.ilike(f"{drg}-%"))
-            drg_conditions.append(Provider.ms_drg_definition.contains(drg))
-        else:
-            # Enhanced text matching with synonyms
-            words = drg_lower.split()
-            
-            for word in words:
-                if len(word) > 2:  # Skip very short words
-                    # Add original word
-                    drg_conditions.append(Provider.ms_drg_definition.ilike(f"%{word}%"))
-                    
-                    # Add synonyms if available
-                    if word in self.PROCEDURE_SYNONYMS:
-                        for synonym in self.PROCEDURE_SYNONYMS[word]:
-                            drg_conditions.append(Provider.ms_drg_definition.ilike(f"%{synonym}%"))
-                    
-                    # Add partial matches for compound words
-                    if len(word) > 4:
-                        drg_conditions.append(Provider.ms_drg_definition.ilike(f"%{word[:4]}%"))
+            # Exact DRG code; "470 - ..." and "470-..." both contain the code
+            return [drg]
         
-        return drg_conditions
+        # Enhanced text matching with synonyms
+        terms = []
+        for word in drg_lower.split():
+            if len(word) > 2:  # Skip very short words
+                # Add original word
+                terms.append(word)
+                
+                # Add synonyms if available
+                terms.extend(self.PROCEDURE_SYNONYMS.get(word, ()))
+                
+                # Add partial matches for compound words
+                if len(word) > 4:
+                    terms.append(word[:4])
+        
+        # Drop repeats, and any term that contains another one: "%repl%"
+        # already matches everything "%replacement%" would
+        terms = list(dict.fromkeys(terms))
+        return [term for term in terms if not any(other != term and other in term for other in terms)]
     
-    def _calculate_composite_score(self, provider: ProviderResponse) -> float:
+    @staticmethod
+    def _calculate_composite_scores(providers: List[ProviderResponse]) -> np.ndarray:
         """
-        Calculate composite ranking score based on multiple factors:
+        Calculate composite ranking scores for a batch of providers based on:
         - Cost effectiveness (lower cost = higher score)
         - Quality rating (higher rating = higher score)
         - Distance preference (closer = higher score)
         - Volume/experience (more procedures = higher score)
         """
-        try:
-            # Cost score (inverse relationship - lower cost is better)
-            # Normalize to prevent division by zero and extreme values
-            cost = max(provider.average_covered_charges or 50000, 1000)
-            cost_score = 1000000 / cost  # Inverse scoring
-            
-            # Rating score (higher is better)
-            rating = provider.average_rating or 5.0  # Default to average if no rating
-            rating_score = rating * 15  # Weight rating significantly
-            
-            # Distance score (closer is better)
-            distance = provider.distance_km or 0
-            distance_score = max(0, 100 - (distance * 1.5))  # Penalty for distance
-            
-            # Volume score (more experience is better, but with diminishing returns)
-            volume = provider.total_discharges or 0
-            volume_score = min(math.log(volume + 1) * 10, 50)  # Logarithmic scale, capped at 50
-            
-            # Composite score with weights
-            composite_score = (
-                cost_score * 0.4 +          # 40% weight on cost
-                rating_score * 0.35 +       # 35% weight on rating
-                distance_score * 0.15 +     # 15% weight on distance
-                volume_score * 0.1          # 10% weight on volume
-            )
-            
-            return composite_score
-            
-        except Exception as e:
-            logger.error(f"Error calculating composite score: {e}")
-            return 0.0
+        count = len(providers)
+        charges = np.fromiter((p.average_covered_charges or 50000 for p in providers), dtype=np.float64, count=count)
+        ratings = np.fromiter((p.average_rating or 5.0 for p in providers), dtype=np.float64, count=count)
+        distances = np.fromiter((p.distance_km or 0 for p in providers), dtype=np.float64, count=count)
+        volumes = np.fromiter((p.total_discharges or 0 for p in providers), dtype=np.float64, count=count)
+        
+        # Cost score (inverse relationship - lower cost is better), floored to
+        # prevent extreme values
+        cost_score = 1000000 / np.maximum(charges, 1000)
+        
+        # Rating score (higher is better); unrated providers count as average
+        rating_score = ratings * 15
+        
+        # Distance score (closer is better)
+        distance_score = np.maximum(0, 100 - distances * 1.5)
+        
+        # Volume score (more experience is better, but with diminishing returns)
+        volume_score = np.minimum(np.log(volumes + 1) * 10, 50)
+        
+        # Composite score with weights
+        return (
+            cost_score * 0.4 +          # 40% weight on cost
+            rating_score * 0.35 +       # 35% weight on rating
+            distance_score * 0.15 +     # 15% weight on distance
+            volume_score * 0.1          # 10% weight on volume
+        )
     
-    async def _get_zip_coordinates(self, db: AsyncSession, zip_code: str) -> Tuple[Optional[float], Optional[float]]:
+    async def _get_zip_coordinates(self, db: Union[AsyncSession, AsyncConnection], zip_code: str) -> Tuple[Optional[float], Optional[float]]:
         """Enhanced coordinate lookup with database fallback"""
         
         # First, check our hardcoded coordinates
@@ -215,7 +298,7 @@ class ProviderService:
                 return coords.latitude, coords.longitude
         
         except Exception as e:
-            logger.error(f"Error getting ZIP coordinates from database: {e}")
+            logger.error("Error getting ZIP coordinates from database: %s", e)
         
         # Enhanced fallback with better regional approximations
         if zip_code.startswith('10'):  # Manhattan/NYC
@@ -232,11 +315,31 @@ class ProviderService:
             # Default to NY state center with regional variation
             return 42.9538 + (hash(zip_code) % 200 - 100) * 0.02, -75.5268 + (hash(zip_code) % 200 - 100) * 0.02
     
+    EARTH_RADIUS_KM = 6371
+    
+    def _bounding_box_conditions(self, lat: float, lng: float, radius_km: float) -> List:
+        """
+        Latitude/longitude ranges enclosing every point within radius_km of
+        (lat, lng) by Haversine distance, as index-friendly BETWEEN filters
+        """
+        angular_radius = radius_km / self.EARTH_RADIUS_KM
+        delta_lat = math.degrees(angular_radius)
+        conditions = [Provider.latitude.between(lat - delta_lat, lat + delta_lat)]
+        
+        # Longitude span widens with latitude; near the poles (or for huge
+        # radii) or across the antimeridian the box isn't meaningful, so skip it
+        sin_ratio = math.sin(angular_radius) / math.cos(math.radians(lat))
+        if sin_ratio < 1:
+            delta_lng = math.degrees(math.asin(sin_ratio))
+            if -180 <= lng - delta_lng and lng + delta_lng <= 180:
+                conditions.append(Provider.longitude.between(lng - delta_lng, lng + delta_lng))
+        return conditions
+    
     def _calculate_distance(self, lat1: float, lng1: float, lat2: float, lng2: float) -> float:
         """Calculate distance between two points using Haversine formula"""
         try:
             # Haversine formula
-            R = 6371  # Earth's radius in kilometers
+            R = self.EARTH_RADIUS_KM  # Earth's radius in kilometers
             
             lat1_rad = math.radians(lat1)
             lat2_rad = math.radians(lat2)
@@ -251,7 +354,7 @@ class ProviderService:
             return R * c
             
         except Exception as e:
-            logger.error(f"Error calculating distance: {e}")
+            logger.error("Error calculating distance: %s", e)
             return float('inf')
     
     async def get_provider_by_id(self, db: AsyncSession, provider_id: str) -> Optional[Provider]:
@@ -263,7 +366,7 @@ class ProviderService:
             result = await db.execute(query)
             return result.scalars().first()
         except Exception as e:
-            logger.error(f"Error getting provider by ID: {e}")
+            logger.error("Error getting provider by ID: %s", e)
             return None
     
     async def get_top_rated_providers(
@@ -276,11 +379,9 @@ class ProviderService:
         
         try:
             query = (
-                select(Provider, func.avg(Rating.rating).label('avg_rating'))
-                .join(Rating, Provider.provider_id == Rating.provider_id)
-                .group_by(Provider.id)
-                .having(func.count(Rating.id) >= 1)
-                .order_by(func.avg(Rating.rating).desc())
+                select(*PROVIDER_ROW_COLUMNS, RATING_AVERAGES.c.avg_rating)
+                .join(RATING_AVERAGES, RATING_AVERAGES.c.provider_id == Provider.provider_id)
+                .order_by(RATING_AVERAGES.c.avg_rating.desc())
                 .limit(limit)
             )
             
@@ -290,31 +391,25 @@ class ProviderService:
                     query = query.where(or_(*drg_conditions))
             
             result = await db.execute(query)
-            providers_with_ratings = result.all()
-            
-            provider_responses = []
-            for provider, avg_rating in providers_with_ratings:
-                provider_response = ProviderResponse(
-                    provider_id=provider.provider_id,
-                    provider_name=provider.provider_name,
-                    provider_city=provider.provider_city,
-                    provider_state=provider.provider_state,
-                    provider_zip_code=provider.provider_zip_code,
-                    ms_drg_definition=provider.ms_drg_definition,
-                    total_discharges=provider.total_discharges or 0,
-                    average_covered_charges=provider.average_covered_charges or 0.0,
-                    average_total_payments=provider.average_total_payments or 0.0,
-                    average_medicare_payments=provider.average_medicare_payments or 0.0,
-                    average_rating=round(avg_rating, 1) if avg_rating else None
-                )
-                provider_responses.append(provider_response)
-            
-            return provider_responses
+            return [self._build_response(row) for row in result.all()]
             
         except Exception as e:
-            logger.error(f"Error getting top rated providers: {e}")
+            logger.error("Error getting top rated providers: %s", e)
             return []
     
+    def _select_with_rating(self):
+        """
+        Provider row columns plus avg_rating. On PostgreSQL every endpoint reads
+        the average from provider_ratings_mv, an indexed point lookup instead of
+        aggregating per row, so search, /top-rated and /cheapest always agree
+        """
+        if IS_POSTGRES:
+            return (
+                select(*PROVIDER_ROW_COLUMNS, RATING_AVERAGES.c.avg_rating)
+                .outerjoin(RATING_AVERAGES, RATING_AVERAGES.c.provider_id == Provider.provider_id)
+            )
+        return select(*PROVIDER_ROW_COLUMNS, AVG_RATING)
+    
     async def get_cheapest_providers(
         self,
         db: AsyncSession,
@@ -325,9 +420,7 @@ class ProviderService:
         
         try:
             query = (
-                select(Provider, func.avg(Rating.rating).label('avg_rating'))
-                .outerjoin(Rating, Provider.provider_id == Rating.provider_id)
-                .group_by(Provider.id)
+                self._select_with_rating()
                 .where(Provider.average_covered_charges > 0)
                 .order_by(Provider.average_covered_charges.asc())
                 .limit(limit)
@@ -339,29 +432,10 @@ class ProviderService:
                     query = query.where(or_(*drg_conditions))
             
             result = await db.execute(query)
-            providers_with_ratings = result.all()
-            
-            provider_responses = []
-            for provider, avg_rating in providers_with_ratings:
-                provider_response = ProviderResponse(
-                    provider_id=provider.provider_id,
-                    provider_name=provider.provider_name,
-                    provider_city=provider.provider_city,
-                    provider_state=provider.provider_state,
-                    provider_zip_code=provider.provider_zip_code,
-                    ms_drg_definition=provider.ms_drg_definition,
-                    total_discharges=provider.total_discharges or 0,
-                    average_covered_charges=provider.average_covered_charges or 0.0,
-                    average_total_payments=provider.average_total_payments or 0.0,
-                    average_medicare_payments=provider.average_medicare_payments or 0.0,
-                    average_rating=round(avg_rating, 1) if avg_rating else None
-                )
-                provider_responses.append(provider_response)
-            
-            return provider_responses
+            return [self._build_response(row) for row in result.all()]
             
         except Exception as e:
-            logger.error(f"Error getting cheapest providers: {e}")
+            logger.error("Error getting cheapest providers: %s", e)
             return []
     
     async def get_provider_statistics(self, db: AsyncSession) -> dict:
@@ -410,5 +484,5 @@ class ProviderService:
             return stats
             
         except Exception as e:
-            logger.error(f"Error getting provider statistics: {e}")
+            logger.error("Error getting provider statistics: %s", e)
             return {}
\ No newline at end of file
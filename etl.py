@@ -6,6 +6,7 @@ import time
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models import Provider, Rating, Base
+from app.database import refresh_rating_view, vacuum_database
 import os
 from dotenv import load_dotenv
 from typing import Optional, Tuple, Dict, List
@@ -653,7 +654,12 @@ class HealthcareETL:
             # 4. Generate enhanced mock ratings
             await self.generate_enhanced_mock_ratings(provider_ids)
             
-            # 5. Verify data and relationships
+            # 5. Refresh the rating averages and planner statistics after the bulk load
+            await refresh_rating_view()
+            for table_name in ("providers", "ratings"):
+                await vacuum_database(table_name)
+            
+            # 6. Verify data and relationships
             await self.verify_data()
             
             logger.info("✅ Enhanced ETL process completed successfully!")
@@ -695,4 +701,9 @@ async def main():
         logger.error("\n❌ ETL process failed. Please check the errors above.")
 
 if __name__ == "__main__":
+    try:
+        import uvloop  # faster event loop for the asyncpg round-trips
+        uvloop.install()
+    except ImportError:  # not available on Windows
+        pass
     asyncio.run(main())
\ No newline at end of file
@@ -12,6 +12,7 @@ from app.database import (
     engine, 
     check_database_health, 
     initialize_database, 
+    initialize_database_parallel,
     drop_all_tables,
     get_database_stats,
     get_pool_status,
@@ -32,8 +33,9 @@ logger = logging.getLogger(__name__)
 class DatabaseInitializer:
     """Enhanced database initialization with comprehensive setup and validation"""
     
-    def __init__(self):
+    def __init__(self, parallel: bool = False):
         self.start_time = time.time()
+        self.parallel = parallel
         
     async def check_prerequisites(self) -> bool:
         """Check if all prerequisites are met before initialization"""
@@ -146,7 +148,10 @@ class DatabaseInitializer:
             logger.info("Dropped existing tables")
             
             # Create new tables
-            await initialize_database()
+            if self.parallel:
+                await initialize_database_parallel()
+            else:
+                await initialize_database()
             logger.info("✅ Database tables created successfully")
             
             # Verify table creation
@@ -305,9 +310,9 @@ def interactive_setup():
     
     return True, create_backup
 
-async def main():
+async def main(force: bool = False, parallel: bool = False):
     """Main initialization function with error handling"""
-    initializer = DatabaseInitializer()
+    initializer = DatabaseInitializer(parallel=parallel)
     
     try:
         logger.info("🏥 Healthcare Cost Navigator - Database Setup")
@@ -322,7 +327,7 @@ async def main():
             return False
         
         # Interactive confirmation (if running interactively)
-        if sys.stdin.isatty():  # Check if running in interactive terminal
+        if not force and sys.stdin.isatty():  # Check if running in interactive terminal
             try:
                 confirmed, backup = await asyncio.get_event_loop().run_in_executor(
                     None, interactive_setup
@@ -355,12 +360,6 @@ async def main():
         logger.error(f"\n❌ Setup failed with unexpected error: {e}")
         logger.error("Please check your configuration and try again")
         return False
-    finally:
-        # Clean up database connections
-        try:
-            await engine.dispose()
-        except:
-            pass
 
 async def quick_check():
     """Quick database status check without initialization"""
@@ -397,8 +396,20 @@ async def quick_check():
             
     except Exception as e:
         logger.error(f"❌ Status check failed: {e}")
+
+async def run(args) -> bool:
+    """Run the selected command on a single event loop and engine lifetime"""
+    try:
+        if args.check:
+            await quick_check()
+            return True
+        return await main(force=args.force, parallel=args.parallel)
     finally:
-        await engine.dispose()
+        # Clean up database connections exactly once
+        try:
+            await engine.dispose()
+        except Exception:
+            pass
 
 if __name__ == "__main__":
     import argparse
@@ -406,12 +417,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Healthcare Cost Navigator Database Setup")
     parser.add_argument("--check", action="store_true", help="Quick status check only")
     parser.add_argument("--force", action="store_true", help="Skip interactive prompts")
+    parser.add_argument("--parallel", action="store_true", help="Create tables and indexes over concurrent connections (dev loads)")
     args = parser.parse_args()
     
-    if args.check:
-        asyncio.run(quick_check())
-    else:
-        success = asyncio.run(main())
+    try:
+        import uvloop  # faster event loop for the asyncpg round-trips
+        uvloop.install()
+    except ImportError:  # not available on Windows
+        pass
+    
+    success = asyncio.run(run(args))
+    if not args.check:
         if success:
             logger.info("\n🎉 Setup completed successfully!")
             sys.exit(0)
@@ -0,0 +1,15 @@
+-- Healthcare Cost Navigator - PostgreSQL initialization
+-- Runs once when the database volume is first created (docker-entrypoint-initdb.d)
+
+-- Session defaults applied server-side, so no connection has to send them.
+-- This also covers clients behind PgBouncer, which does not forward the
+-- jit startup parameter.
+DO $$
+BEGIN
+    EXECUTE format('ALTER DATABASE %I SET jit = off', current_database());
+END
+$$;
+
+-- Trigram matching for the DRG text search index (idx_drg_trgm). Created here
+-- as superuser, since the application role may not be allowed to.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
@@ -1,13 +1,14 @@
 # tests/test_api.py
 import pytest
 import asyncio
+import json
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 import os
 
 from app.main import app
-from app.database import get_db
+from app.database import get_db, get_ro_db
 from app.models import Base
 
 # Test database URL
@@ -53,6 +54,7 @@ async def client(test_db_session):
         yield test_db_session
     
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_ro_db] = override_get_db
     
     async with AsyncClient(app=app, base_url="http://test") as ac:
         yield ac
@@ -72,6 +74,13 @@ async def test_providers_search_missing_params(client):
     response = await client.get("/providers")
     assert response.status_code == 422  # Validation error
 
+@pytest.mark.asyncio
+async def test_providers_search_rejects_non_ascii_zip(client):
+    """Full-width digits are not a ZIP code, on either search endpoint"""
+    for path in ("/providers", "/providers/stream"):
+        response = await client.get(path, params={"drg": "470", "zip": "１０００１"})
+        assert response.status_code == 422
+
 @pytest.mark.asyncio
 async def test_providers_search_with_params(client):
     """Test providers endpoint with valid parameters"""
@@ -79,6 +88,15 @@ async def test_providers_search_with_params(client):
     assert response.status_code == 200
     assert isinstance(response.json(), list)
 
+@pytest.mark.asyncio
+async def test_providers_stream_with_params(client):
+    """Test streaming providers endpoint returns newline-delimited JSON"""
+    response = await client.get("/providers/stream?drg=470&zip=10001&radius_km=50")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    for line in response.text.splitlines():
+        assert "provider_id" in json.loads(line)
+
 @pytest.mark.asyncio 
 async def test_ask_endpoint_out_of_scope(client):
     """Test AI assistant with out-of-scope question"""
@@ -99,4 +117,81 @@ async def test_ask_endpoint_healthcare_question(client):
     )
     assert response.status_code == 200
     data = response.json()
-    assert "answer" in data
\ No newline at end of file
+    assert "answer" in data
+
+@pytest.mark.asyncio
+async def test_providers_stream_sends_first_line_before_search_finishes(monkeypatch):
+    """Streamed rows reach the client as they are produced, even when the
+    client accepts gzip"""
+    from app import main
+    from app.schemas import ProviderResponse
+    
+    row = ProviderResponse(
+        provider_id="330001", provider_name="TEST HOSPITAL", provider_city="NEW YORK",
+        provider_state="NY", provider_zip_code="10001", ms_drg_definition="470 - TEST",
+        total_discharges=10, average_covered_charges=1000.0,
+        average_total_payments=900.0, average_medicare_payments=800.0,
+    )
+    release = asyncio.Event()
+    
+    async def slow_search(*args, **kwargs):
+        yield row
+        await release.wait()
+    
+    monkeypatch.setattr(main.provider_service, "search_providers_iter", slow_search)
+    
+    first_chunk = asyncio.get_running_loop().create_future()
+    
+    async def send(message):
+        if message["type"] == "http.response.body" and message.get("body") and not first_chunk.done():
+            first_chunk.set_result(message["body"])
+    
+    async def receive():
+        await asyncio.Event().wait()  # client stays connected
+    
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "GET", "scheme": "http", "root_path": "",
+        "path": "/providers/stream", "raw_path": b"/providers/stream",
+        "query_string": b"drg=stream-test&zip=10001",
+        "headers": [(b"host", b"test"), (b"accept-encoding", b"gzip")],
+        "client": ("test", 1234), "server": ("test", 80),
+    }
+    request = asyncio.create_task(app(scope, receive, send))
+    try:
+        body = await asyncio.wait_for(first_chunk, timeout=5)
+        assert not request.done()
+        assert json.loads(body.splitlines()[0])["provider_id"] == "330001"
+    finally:
+        release.set()
+        await asyncio.wait_for(request, timeout=5)
+
+@pytest.mark.asyncio
+async def test_single_flight_follower_survives_leader_cancel():
+    """Cancelling the request that started a shared call still delivers its
+    result to the requests waiting on it"""
+    from app.cache import SingleFlight
+    
+    flight = SingleFlight()
+    release = asyncio.Event()
+    calls = 0
+    
+    async def work():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "answer"
+    
+    leader = asyncio.create_task(flight.do("q", work))
+    await asyncio.sleep(0)
+    follower = asyncio.create_task(flight.do("q", work))
+    await asyncio.sleep(0)
+    
+    leader.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    
+    assert await asyncio.wait_for(follower, timeout=5) == "answer"
+    assert leader.cancelled()
+    assert calls == 1
+    assert len(flight) == 0